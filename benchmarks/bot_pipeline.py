@@ -0,0 +1,266 @@
+"""消息处理全流程的离线基准测试
+
+在进程内构造 Update 放入 Application 的更新队列，走完
+ChatBot.handle_message → ChatChain.run → 工具 → 发送回复 的完整路径。
+Gemini 换成延迟可配置、按脚本输出 ReAct 的假模型；CoinGecko、
+alternative.me、blockchain.info 和 Telegram Bot API 由本地 aiohttp
+服务器模拟，不访问外网。
+
+报告：
+- 从消息进入队列到收到回复的延迟 p50/p95/p99
+- 每秒处理的消息数
+- 每 1000 个群组的 RSS 增长
+- 各上游接口、模型和 Telegram 接口的调用次数
+
+用法（在项目根目录）：
+    python -m benchmarks.bot_pipeline --messages 1000 --groups 200 --rate 100
+    python -m benchmarks.bot_pipeline --json results.json
+
+其它配置（如 MAX_CONCURRENT_LLM、STREAM_RESPONSES）可通过环境变量覆盖。
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import time
+from .fakes import BOT_USERNAME, FakeUpstream, ScriptedGemini, llm_calls
+
+# 合成消息的文本样本，覆盖直接调用工具、代理和普通对话三种路径
+SAMPLE_TEXTS = [
+    "btc 价格",
+    "以太坊现在多少钱",
+    "sol 和 eth 的价格",
+    "分析一下 btc 走势",
+    "恐慌指数",
+    "你觉得大饼会涨吗",
+    "今天大家吃了什么",
+    "hello everyone",
+]
+
+
+def current_rss() -> int:
+    """当前进程常驻内存（字节）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # 非 Linux 平台只能取峰值（macOS 单位为字节，Linux 为 KB）
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩法计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class LatencyTracker:
+    """记录每条消息从入队到所在群组收到下一条回复的时间"""
+
+    def __init__(self):
+        self.pending: Dict[int, List[float]] = defaultdict(list)
+        self.latencies: List[float] = []
+        self.replies = 0
+        self.errors = 0
+        self.first_sent: Optional[float] = None
+        self.last_reply: Optional[float] = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def submitted(self, chat_id: int) -> None:
+        now = time.perf_counter()
+        self.first_sent = self.first_sent or now
+        self.pending[chat_id].append(now)
+        self._idle.clear()
+
+    def replied(self, chat_id: int, text: str) -> None:
+        now = time.perf_counter()
+        self.replies += 1
+        self.last_reply = now
+        if text.startswith("抱歉"):
+            self.errors += 1
+        for submitted_at in self.pending.pop(chat_id, []):
+            self.latencies.append(now - submitted_at)
+        if not self.pending:
+            self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def reset(self) -> None:
+        self.__init__()
+
+
+def update_data(update_id: int, chat_id: int, user_id: int, text: str) -> dict:
+    """一条@机器人的群消息（Bot API 的 JSON 格式）"""
+    mention = f"@{BOT_USERNAME}"
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup", "title": f"bench {chat_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": f"{mention} {text}",
+            "entities": [{"type": "mention", "offset": 0, "length": len(mention)}],
+        },
+    }
+
+
+def build_update(update_id: int, chat_id: int, user_id: int, text: str, bot):
+    """构造一条@机器人的群消息"""
+    from telegram import Update
+
+    return Update.de_json(update_data(update_id, chat_id, user_id, text), bot)
+
+
+def configure_environment(args, upstream: FakeUpstream) -> None:
+    """在导入机器人代码之前设置配置（Config 在导入时读取环境变量）"""
+    os.environ["TELEGRAM_TOKEN"] = "123456:bench"
+    os.environ["GEMINI_API_KEY"] = "bench"
+    os.environ["TELEGRAM_API_URL"] = f"{upstream.url}/bot"
+    os.environ["RUN_MODE"] = "polling"
+    os.environ["RESPONSE_PROBABILITY"] = "0"
+    os.environ.setdefault("MEMORY_DB_PATH", "")
+    os.environ.setdefault("PRICE_ARCHIVE_DIR", "")
+    os.environ.setdefault("COIN_LIST_PATH", "")
+    os.environ.setdefault("MEMORY_MAX_GROUPS", str(max(args.groups * 2, 1000)))
+    os.environ.setdefault("RESPONSE_DEBOUNCE", str(args.debounce))
+    os.environ.setdefault("MARKET_PREFETCH_INTERVAL", "0")
+    # 默认不让限流器成为瓶颈，需要时通过环境变量设置真实限额
+    os.environ.setdefault("LLM_RPM", "1000000")
+    os.environ.setdefault("LLM_TPM", "1000000000")
+
+
+def install_fakes(args, upstream: FakeUpstream) -> None:
+    """把模型和数据源地址替换为假实现"""
+    from src.chains import base
+    from src.chains.model import DispatchedChatModel
+    from src.tools.crypto import analysis, price
+
+    class BenchChatModel(DispatchedChatModel, ScriptedGemini):
+        """经过调度器的脚本化模型"""
+        latency: float = args.llm_latency / 1000
+
+    base.DispatchedChatModel = BenchChatModel
+    price.COINGECKO_API_URL = f"{upstream.url}/coingecko/api/v3"
+    analysis.ALTERNATIVE_ME_API_URL = f"{upstream.url}/alternative"
+    analysis.BLOCKCHAIN_API_URL = f"{upstream.url}/blockchain"
+
+
+async def feed(application, tracker: LatencyTracker, chat_ids: List[int], messages: int, rate: float, first_update: int) -> None:
+    """按固定速率把消息放入更新队列（rate 为 0 时不限速）"""
+    interval = 1 / rate if rate > 0 else 0
+    started = time.perf_counter()
+    for i in range(messages):
+        chat_id = chat_ids[i % len(chat_ids)]
+        update = build_update(first_update + i, chat_id, i % 97 + 1, SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)], application.bot)
+        tracker.submitted(chat_id)
+        await application.update_queue.put(update)
+        if interval:
+            delay = started + (i + 1) * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+
+async def run_benchmark(args) -> dict:
+    upstream = FakeUpstream(latency=args.upstream_latency / 1000)
+    await upstream.start()
+    configure_environment(args, upstream)
+    install_fakes(args, upstream)
+
+    from src.bot.bot import ChatBot
+    from src.bot.lifecycle import running_application
+
+    tracker = LatencyTracker()
+    upstream.on_send = tracker.replied
+    bot = ChatBot()
+    try:
+        async with running_application(bot.application):
+            # 预热：导入、连接池和缓存就绪后再开始计量
+            await feed(bot.application, tracker, [-1], args.warmup, 0, 1)
+            await tracker.wait_idle(args.timeout)
+            tracker.reset()
+            upstream.calls.clear()
+            llm_calls.clear()
+            rss_before = current_rss()
+
+            chat_ids = [-1000000000000 - g for g in range(args.groups)]
+            await feed(bot.application, tracker, chat_ids, args.messages, args.rate, args.warmup + 1)
+            completed = await tracker.wait_idle(args.timeout)
+            rss_after = current_rss()
+    finally:
+        await upstream.stop()
+
+    elapsed = (tracker.last_reply or time.perf_counter()) - (tracker.first_sent or 0)
+    latencies_ms = [latency * 1000 for latency in tracker.latencies]
+    return {
+        "messages": args.messages,
+        "groups": args.groups,
+        "completed": completed,
+        "answered": len(latencies_ms),
+        "replies": tracker.replies,
+        "errors": tracker.errors,
+        "latency_ms": {
+            "p50": percentile(latencies_ms, 50),
+            "p95": percentile(latencies_ms, 95),
+            "p99": percentile(latencies_ms, 99),
+            "max": max(latencies_ms, default=0.0),
+        },
+        "msgs_per_sec": len(latencies_ms) / elapsed if elapsed > 0 else 0.0,
+        "rss_mib_per_1k_groups": (rss_after - rss_before) / 2**20 / args.groups * 1000,
+        "upstream_calls": dict(upstream.calls),
+        "llm_calls": dict(llm_calls),
+    }
+
+
+def print_report(result: dict) -> None:
+    latency = result["latency_ms"]
+    print(f"messages:   {result['messages']} to {result['groups']} groups, "
+          f"{result['answered']} answered, {result['replies']} replies, {result['errors']} errors"
+          + ("" if result["completed"] else " (timed out)"))
+    print(f"latency:    p50 {latency['p50']:.1f} ms  p95 {latency['p95']:.1f} ms  "
+          f"p99 {latency['p99']:.1f} ms  max {latency['max']:.1f} ms")
+    print(f"throughput: {result['msgs_per_sec']:.1f} msgs/sec")
+    print(f"rss:        {result['rss_mib_per_1k_groups']:.2f} MiB per 1k groups")
+    print("llm calls:  " + (", ".join(f"{k} {v}" for k, v in sorted(result["llm_calls"].items())) or "0"))
+    print("upstream:")
+    for name, count in sorted(result["upstream_calls"].items()):
+        print(f"  {name:<28} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=100, help="每秒入队的消息数，0 表示不限速")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=500, help="模拟模型延迟（毫秒）")
+    parser.add_argument("--upstream-latency", type=float, default=50, help="模拟上游接口延迟（毫秒）")
+    parser.add_argument("--debounce", type=float, default=0.2, help="RESPONSE_DEBOUNCE（秒）")
+    parser.add_argument("--timeout", type=float, default=300, help="等待所有回复的最长时间（秒）")
+    parser.add_argument("--json", metavar="PATH", help="把结果写入 JSON 文件，便于比较")
+    parser.add_argument("--verbose", action="store_true", help="输出机器人日志")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    result = asyncio.run(run_benchmark(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
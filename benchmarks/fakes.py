@@ -0,0 +1,263 @@
+"""基准测试用的假服务
+
+- FakeUpstream：本地 aiohttp 服务器，模拟 CoinGecko、alternative.me、
+  blockchain.info 和 Telegram Bot API，并统计每个接口的调用次数
+- ScriptedGemini：不访问网络的 Gemini 模型，按脚本返回 ReAct 输出，
+  延迟可配置
+"""
+from collections import Counter
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+import asyncio
+import json
+import re
+import time
+import numpy as np
+from aiohttp import web
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+BOT_USERNAME = "bench_bot"
+
+# 各币种的假价格（美元）
+FAKE_PRICES = {
+    "bitcoin": 65432.21,
+    "ethereum": 3456.78,
+    "binancecoin": 567.89,
+    "solana": 145.67,
+    "ripple": 0.5234,
+    "cardano": 0.4567,
+    "dogecoin": 0.1234,
+    "tether": 1.0,
+    "polkadot": 6.78,
+    "avalanche-2": 34.56,
+}
+
+# 假币种列表 (id, symbol, name)，按市值排序
+FAKE_COINS = [
+    ("bitcoin", "btc", "Bitcoin"),
+    ("ethereum", "eth", "Ethereum"),
+    ("tether", "usdt", "Tether"),
+    ("binancecoin", "bnb", "BNB"),
+    ("solana", "sol", "Solana"),
+    ("ripple", "xrp", "XRP"),
+    ("dogecoin", "doge", "Dogecoin"),
+    ("cardano", "ada", "Cardano"),
+    ("avalanche-2", "avax", "Avalanche"),
+    ("polkadot", "dot", "Polkadot"),
+    ("pepe", "pepe", "Pepe"),
+    ("arbitrum", "arb", "Arbitrum"),
+    ("shiba-inu", "shib", "Shiba Inu"),
+    ("pepe-2", "pepe", "Pepe 2.0"),
+]
+
+# 计价货币相对美元的汇率
+FAKE_RATES = {"usd": 1.0, "cny": 7.2, "eur": 0.92, "jpy": 150.0, "krw": 1350.0, "hkd": 7.8, "gbp": 0.79}
+
+# 假历史序列的起始时间（2012-01-01）
+FAKE_HISTORY_START = 1325376000
+
+# 模型调用次数
+llm_calls: Counter = Counter()
+
+
+class FakeUpstream:
+    """模拟所有外部 HTTP 接口的本地服务器"""
+
+    def __init__(self, latency: float = 0.05, host: str = "127.0.0.1"):
+        self.latency = latency
+        self.host = host
+        self.port: Optional[int] = None
+        self.calls: Counter = Counter()
+        # 各接口第一次被调用的时间（time.perf_counter）
+        self.first_called: Dict[str, float] = {}
+        # 下一次 getUpdates 返回的更新
+        self.pending_updates: List[dict] = []
+        # 机器人发送新消息时回调 (chat_id, text)
+        self.on_send: Optional[Callable[[int, str], None]] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._message_id = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/coingecko/api/v3/simple/price", self.handle_simple_price)
+        app.router.add_get("/coingecko/api/v3/coins/list", self.handle_coin_list)
+        app.router.add_get("/coingecko/api/v3/coins/markets", self.handle_coin_markets)
+        app.router.add_get("/alternative/fng/", self.handle_fear_greed)
+        app.router.add_get("/blockchain/charts/{chart}", self.handle_chart)
+        app.router.add_post("/bot{token}/{method}", self.handle_telegram)
+        return app
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, 0)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle_simple_price(self, request: web.Request) -> web.Response:
+        self.calls["coingecko"] += 1
+        await asyncio.sleep(self.latency)
+        ids = [i for i in request.query.get("ids", "").split(",") if i in FAKE_PRICES]
+        currencies = [c for c in request.query.get("vs_currencies", "usd").split(",") if c in FAKE_RATES]
+        data = {
+            crypto_id: {c: round(FAKE_PRICES[crypto_id] * FAKE_RATES[c], 4) for c in currencies}
+            for crypto_id in ids
+        }
+        return web.json_response(data)
+
+    async def handle_coin_list(self, request: web.Request) -> web.Response:
+        self.calls["coingecko"] += 1
+        await asyncio.sleep(self.latency)
+        return web.json_response([
+            {"id": crypto_id, "symbol": symbol, "name": name}
+            for crypto_id, symbol, name in FAKE_COINS
+        ])
+
+    async def handle_coin_markets(self, request: web.Request) -> web.Response:
+        self.calls["coingecko"] += 1
+        await asyncio.sleep(self.latency)
+        per_page = int(request.query.get("per_page", "100"))
+        start = (int(request.query.get("page", "1")) - 1) * per_page
+        return web.json_response([
+            {"id": crypto_id, "symbol": symbol, "name": name, "market_cap_rank": start + rank + 1}
+            for rank, (crypto_id, symbol, name) in enumerate(FAKE_COINS[start:start + per_page])
+        ])
+
+    async def handle_fear_greed(self, request: web.Request) -> web.Response:
+        self.calls["alternative.me"] += 1
+        await asyncio.sleep(self.latency)
+        return web.json_response({"data": [{"value": "52", "value_classification": "Neutral"}]})
+
+    async def handle_chart(self, request: web.Request) -> web.Response:
+        self.calls["blockchain.info"] += 1
+        await asyncio.sleep(self.latency)
+        chart = request.match_info["chart"]
+        if chart not in ("market-price", "mvrv"):
+            return web.json_response({"error": "unknown chart"}, status=404)
+        # 2012 年起的日线：价格沿对数趋势增长并带四年周期波动，结尾为 FAKE_PRICES
+        end = int(time.time()) // 86400 * 86400
+        days = np.arange(FAKE_HISTORY_START // 86400, end // 86400 + 1)
+        cycle = np.sin((days - days[0]) * 2 * np.pi / 1460)
+        if chart == "mvrv":
+            series = 1.8 + 1.2 * cycle
+        else:
+            trend = np.exp(np.linspace(np.log(5), np.log(FAKE_PRICES["bitcoin"]), len(days)))
+            series = trend * np.exp(0.6 * (cycle - cycle[-1]))
+        timespan = request.query.get("timespan", "all")
+        if timespan.endswith("days"):
+            days, series = days[-int(timespan[:-4]):], series[-int(timespan[:-4]):]
+        values = [{"x": int(day) * 86400, "y": float(value)} for day, value in zip(days, series)]
+        return web.json_response({"values": values})
+
+    async def handle_telegram(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[f"telegram.{method}"] += 1
+        self.first_called.setdefault(f"telegram.{method}", time.perf_counter())
+        try:
+            if request.content_type == "application/json":
+                params = await request.json()
+            else:
+                params = dict(await request.post())
+        except ConnectionResetError:
+            # 机器人关闭时取消了进行中的请求
+            return web.Response(status=499)
+
+        if method == "getMe":
+            result: Any = {"id": 1, "is_bot": True, "first_name": "Bench", "username": BOT_USERNAME}
+        elif method == "getUpdates" and self.pending_updates:
+            result, self.pending_updates = self.pending_updates, []
+        elif method == "getUpdates":
+            # 长轮询：没有新的更新
+            await asyncio.sleep(min(float(params.get("timeout") or 0), 0.5))
+            result = []
+        elif method in ("sendMessage", "editMessageText"):
+            chat_id = int(params["chat_id"])
+            text = str(params.get("text", ""))
+            if method == "sendMessage":
+                self._message_id += 1
+                message_id = self._message_id
+                if self.on_send is not None:
+                    self.on_send(chat_id, text)
+            else:
+                message_id = int(params["message_id"])
+            result = {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup", "title": "bench"},
+                "from": {"id": 1, "is_bot": True, "first_name": "Bench", "username": BOT_USERNAME},
+                "text": text,
+            }
+        else:
+            result = True
+        return web.Response(
+            text=json.dumps({"ok": True, "result": result}),
+            content_type="application/json",
+        )
+
+
+# 取出提示词中最后一次用户输入及其后的代理草稿
+_INPUT_PATTERN = re.compile(r"用户输入：(.*)\Z", re.S)
+
+
+def scripted_reply(prompt: str) -> str:
+    """按提示词内容返回脚本化的模型输出"""
+    match = _INPUT_PATTERN.search(prompt)
+    tail = match.group(1) if match else prompt
+
+    # 非 ReAct 提示词：直接回答
+    if "Action Input" not in prompt:
+        return "这是基准测试的模拟回答，\n\n内容没有实际意义。"
+
+    if "Observation:" in tail:
+        return "Thought: 已经拿到结果\nFinal Answer: 根据查询结果，行情目前比较平稳。"
+    if re.search(r"分析|走势|趋势|指标", tail):
+        return "Thought: 用户想了解走势，需要进行技术分析\nAction: crypto_analysis\nAction Input: bitcoin"
+    if re.search(r"btc|eth|sol|币|饼", tail, re.I):
+        return "Thought: 用户关心价格，我需要使用价格查询工具\nAction: crypto_price\nAction Input: btc eth"
+    return "Thought: 这是普通对话，不需要使用工具\nFinal Answer: 你好！很高兴见到你。"
+
+
+def _prompt_text(messages: List[Any]) -> str:
+    return "\n".join(str(message.content) for message in messages)
+
+
+class ScriptedGemini(ChatGoogleGenerativeAI):
+    """不访问网络、按脚本回答的 Gemini 模型"""
+
+    latency: float = 0.5
+    stream_chunks: int = 4
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        llm_calls["generate"] += 1
+        await asyncio.sleep(self.latency)
+        text = scripted_reply(_prompt_text(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator:
+        llm_calls["stream"] += 1
+        text = scripted_reply(_prompt_text(messages))
+        size = max(1, -(-len(text) // self.stream_chunks))
+        for start in range(0, len(text), size):
+            await asyncio.sleep(self.latency / self.stream_chunks)
+            piece = text[start:start + size]
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        llm_calls["generate"] += 1
+        time.sleep(self.latency)
+        text = scripted_reply(_prompt_text(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
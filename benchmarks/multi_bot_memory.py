@@ -0,0 +1,87 @@
+"""多机器人模式的内存测试
+
+分别在新进程中启动 1 个机器人和 N 个机器人（MultiBotRunner），每个机器人
+处理几条消息后记录进程 RSS，比较 N 个独立进程（N × 单机器人）和
+一个共享进程的内存占用。模型和上游接口使用 bot_pipeline 的假实现。
+
+用法（在项目根目录）：
+    python -m benchmarks.multi_bot_memory --bots 10
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack
+import argparse
+import asyncio
+import multiprocessing
+from .bot_pipeline import (
+    SAMPLE_TEXTS,
+    LatencyTracker,
+    build_update,
+    configure_environment,
+    current_rss,
+    install_fakes,
+)
+from .fakes import FakeUpstream
+
+
+async def _measure(bots: int, messages: int) -> int:
+    upstream = FakeUpstream(latency=0.01)
+    await upstream.start()
+    args = argparse.Namespace(groups=messages, debounce=0.05, llm_latency=50)
+    configure_environment(args, upstream)
+    install_fakes(args, upstream)
+
+    from src.bot.lifecycle import running_application
+    from src.bot.multi import MultiBotRunner
+    from src.bot.profiles import BotProfile
+
+    tracker = LatencyTracker()
+    upstream.on_send = tracker.replied
+    runner = MultiBotRunner([
+        BotProfile.from_settings(f"bench{i}", {"TELEGRAM_TOKEN": f"{100000 + i}:bench", "MEMORY_DB_PATH": ""})
+        for i in range(bots)
+    ])
+    try:
+        async with AsyncExitStack() as stack:
+            for index, bot in enumerate(runner.bots):
+                application = await stack.enter_async_context(running_application(bot.application))
+                for i in range(messages):
+                    chat_id = -1000000000000 - index * messages - i
+                    tracker.submitted(chat_id)
+                    await application.update_queue.put(build_update(
+                        index * messages + i + 1, chat_id, i + 1, SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)], application.bot
+                    ))
+            await tracker.wait_idle(120)
+            return current_rss()
+    finally:
+        await upstream.stop()
+
+
+def measure(bots: int, messages: int) -> int:
+    """在当前进程中运行 bots 个机器人，返回 RSS（字节）"""
+    return asyncio.run(_measure(bots, messages))
+
+
+def measure_in_new_process(bots: int, messages: int) -> int:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(measure, bots, messages).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bots", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=8, help="每个机器人处理的消息数")
+    args = parser.parse_args()
+
+    single = measure_in_new_process(1, args.messages)
+    shared = measure_in_new_process(args.bots, args.messages)
+    separate = single * args.bots
+    print(f"1 bot per process:      {single / 2**20:.1f} MiB")
+    print(f"{args.bots} separate processes: {separate / 2**20:.1f} MiB (estimated)")
+    print(f"{args.bots} bots in one process: {shared / 2**20:.1f} MiB "
+          f"({(shared - single) / 2**20 / max(args.bots - 1, 1):.1f} MiB per extra bot)")
+    print(f"saved:                  {(separate - shared) / 2**20:.1f} MiB ({1 - shared / separate:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""分片吞吐量测试
+
+用合成的群消息驱动 ShardDispatcher，比较不同 worker 数量下的吞吐量。
+worker 对每条消息执行意图路由、群组记忆更新，再加上一段可配置的 CPU
+计算模拟构造提示词等开销，不访问 Telegram 和 LLM。
+
+用法（在项目根目录）：
+    python -m benchmarks.shard_throughput --workers 1 2 4 --messages 20000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+from src.bot.sharding import ShardDispatcher, shard_for
+
+# 合成消息的文本样本
+SAMPLE_TEXTS = [
+    "btc 价格",
+    "以太坊现在多少钱",
+    "分析一下 btc 走势",
+    "恐慌指数",
+    "今天大家吃了什么",
+    "sol 和 eth 的价格",
+    "你觉得大饼会涨吗",
+    "hello everyone",
+]
+
+
+def chat_id_for(group: int) -> int:
+    """合成群组的 chat_id（超级群组 id 为负数）"""
+    return -1000000000000 - group
+
+
+def burn(work_ms: float) -> None:
+    """忙等待，模拟每条消息的 CPU 开销"""
+    deadline = time.perf_counter() + work_ms / 1000
+    while time.perf_counter() < deadline:
+        pass
+
+
+def synthetic_worker(index: int, source_queue, result_queue, work_ms: float) -> None:
+    """worker 入口：处理消息直到收到 None，然后报告处理数量"""
+    from src.chains.router import IntentRouter
+    from src.memory import GroupMemory
+
+    router = IntentRouter()
+    memories = {}
+    processed = 0
+    while True:
+        payload = source_queue.get()
+        if payload is None:
+            break
+        chat_id = payload["chat_id"]
+        memory = memories.get(chat_id)
+        if memory is None:
+            memory = memories[chat_id] = GroupMemory(chat_id=chat_id)
+        router.route(payload["text"])
+        memory.add_message("user", payload["text"], payload["user_id"])
+        memory.get_chat_history()
+        burn(work_ms)
+        processed += 1
+    result_queue.put((index, processed, len(memories)))
+
+
+async def run_once(workers: int, messages: int, groups: int, work_ms: float) -> float:
+    """返回每秒处理的消息数"""
+    result_queue = multiprocessing.get_context("spawn").Queue()
+    dispatcher = ShardDispatcher(
+        workers,
+        synthetic_worker,
+        args=(result_queue, work_ms),
+        queue_size=10000,
+    )
+    dispatcher.start()
+    # 等待 worker 导入完成，避免把启动时间算进吞吐量
+    await asyncio.sleep(2)
+
+    started = time.perf_counter()
+    for i in range(messages):
+        chat_id = chat_id_for(i % groups)
+        await dispatcher.dispatch(chat_id, {
+            "chat_id": chat_id,
+            "user_id": i % 97,
+            "text": SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)],
+        })
+    for target_queue in dispatcher.queues:
+        target_queue.put(None)
+
+    loop = asyncio.get_running_loop()
+    results = [await loop.run_in_executor(None, result_queue.get) for _ in range(workers)]
+    elapsed = time.perf_counter() - started
+    dispatcher.stop()
+
+    total = sum(processed for _, processed, _ in results)
+    assert total == messages, f"lost messages: {total}/{messages}"
+    # 同一群组只会出现在一个 worker 中
+    for index, _, group_count in results:
+        expected = sum(1 for g in range(groups) if shard_for(chat_id_for(g), workers) == index)
+        assert group_count == expected, f"worker {index} owns {group_count} groups, expected {expected}"
+    return messages / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--groups", type=int, default=500)
+    parser.add_argument("--work-ms", type=float, default=0.5, help="每条消息模拟的 CPU 开销（毫秒）")
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'msgs/sec':>10} {'speedup':>8}")
+    for workers in args.workers:
+        rate = asyncio.run(run_once(workers, args.messages, args.groups, args.work_ms))
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>10.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
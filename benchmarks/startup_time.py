@@ -0,0 +1,181 @@
+"""冷启动时间测试
+
+每轮启动一个新的机器人进程（与 run.py 相同的 main() 启动路径，长轮询），
+Telegram Bot API、Gemini 和行情接口由 bot_pipeline 的假实现模拟。
+第一次 getUpdates 返回一条 /start 命令和一条需要调用代理的@消息。
+
+报告（各轮中位数，从创建进程开始计时）：
+- import：导入 src.bot.main 的时间（单独的进程）
+- polling：开始长轮询（第一次 getUpdates）
+- /start：回复 /start 命令，不需要对话链
+- answer：回答@消息，包括对话链的导入和创建
+
+用法（在项目根目录）：
+    python -m benchmarks.startup_time --runs 5
+"""
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+
+START_CHAT_ID = -1001
+MENTION_CHAT_ID = -1002
+MENTION_TEXT = "你觉得大饼会涨吗"
+
+
+def child_environment(upstream_url: str, llm_latency: float) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": str(ROOT),
+        "ENV_FILE": "",
+        "TELEGRAM_TOKEN": "123456:bench",
+        "GEMINI_API_KEY": "bench",
+        "TELEGRAM_API_URL": f"{upstream_url}/bot",
+        "RUN_MODE": "polling",
+        "RESPONSE_PROBABILITY": "0",
+        "RESPONSE_DEBOUNCE": "0",
+        "MEMORY_DB_PATH": "",
+        "PRICE_ARCHIVE_DIR": "",
+        "COIN_LIST_PATH": "",
+        "MARKET_PREFETCH_INTERVAL": "0",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        "BENCH_UPSTREAM_URL": upstream_url,
+        "BENCH_LLM_LATENCY": str(llm_latency),
+    })
+    return env
+
+
+def run_child() -> None:
+    """子进程：按正常路径启动机器人，创建对话链时换上假模型和数据源"""
+    from src.bot import bot as bot_module
+    from src.bot.main import main as bot_main
+
+    load_chain = bot_module._load_chain
+
+    def load_chain_with_fakes():
+        from .bot_pipeline import install_fakes
+
+        args = argparse.Namespace(llm_latency=float(os.environ["BENCH_LLM_LATENCY"]))
+        install_fakes(args, SimpleNamespace(url=os.environ["BENCH_UPSTREAM_URL"]))
+        return load_chain()
+
+    bot_module._load_chain = load_chain_with_fakes
+    bot_main()
+
+
+def measure_import(env: Dict[str, str], cwd: str) -> float:
+    """在新进程中导入 src.bot.main 的时间（秒）"""
+    code = "import time; t = time.perf_counter(); import src.bot.main; print(time.perf_counter() - t)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], env=env, cwd=cwd, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def start_update() -> dict:
+    return {
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": START_CHAT_ID, "type": "supergroup", "title": "bench"},
+            "from": {"id": 1, "is_bot": False, "first_name": "user1"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+async def measure_start(upstream, env: Dict[str, str], cwd: str, timeout: float, verbose: bool) -> Dict[str, Optional[float]]:
+    """启动一个机器人进程，返回各阶段距创建进程的时间（秒）"""
+    from .bot_pipeline import update_data
+
+    replies: Dict[int, float] = {}
+    answered = asyncio.Event()
+
+    def replied(chat_id: int, text: str) -> None:
+        replies.setdefault(chat_id, time.perf_counter())
+        if START_CHAT_ID in replies and MENTION_CHAT_ID in replies:
+            answered.set()
+
+    upstream.on_send = replied
+    upstream.first_called.clear()
+    upstream.pending_updates = [start_update(), update_data(2, MENTION_CHAT_ID, 2, MENTION_TEXT)]
+
+    output = None if verbose else subprocess.DEVNULL
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "benchmarks.startup_time", "--child",
+        env=env, cwd=cwd, stdout=output, stderr=output,
+    )
+    try:
+        await asyncio.wait_for(answered.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        if process.returncode is None:
+            process.terminate()
+        await process.wait()
+
+    def since_start(at: Optional[float]) -> Optional[float]:
+        return at - started if at is not None else None
+
+    return {
+        "polling": since_start(upstream.first_called.get("telegram.getUpdates")),
+        "/start": since_start(replies.get(START_CHAT_ID)),
+        "answer": since_start(replies.get(MENTION_CHAT_ID)),
+    }
+
+
+async def run_benchmark(args) -> Dict[str, List[float]]:
+    from .fakes import FakeUpstream
+
+    upstream = FakeUpstream(latency=args.upstream_latency / 1000)
+    await upstream.start()
+    results: Dict[str, List[float]] = {"import": [], "polling": [], "/start": [], "answer": []}
+    try:
+        with tempfile.TemporaryDirectory() as cwd:
+            env = child_environment(upstream.url, args.llm_latency)
+            for _ in range(args.runs):
+                results["import"].append(await asyncio.to_thread(measure_import, env, cwd))
+                timings = await measure_start(upstream, env, cwd, args.timeout, args.verbose)
+                for name, value in timings.items():
+                    if value is None:
+                        raise RuntimeError(f"Bot did not reach {name} within {args.timeout}s")
+                    results[name].append(value)
+    finally:
+        await upstream.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=200, help="模拟模型延迟（毫秒）")
+    parser.add_argument("--upstream-latency", type=float, default=20, help="模拟上游接口延迟（毫秒）")
+    parser.add_argument("--timeout", type=float, default=60, help="每轮等待回复的最长时间（秒）")
+    parser.add_argument("--verbose", action="store_true", help="输出机器人进程的日志")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    results = asyncio.run(run_benchmark(args))
+    for name, values in results.items():
+        print(f"{name:<8} median {statistics.median(values) * 1000:7.0f} ms  "
+              f"min {min(values) * 1000:7.0f} ms  max {max(values) * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from src.bot.main import run
+from src.bot.main import main
 
 if __name__ == "__main__":
-    run() 
\ No newline at end of file
+    main() 
\ No newline at end of file
@@ -1,4 +1,19 @@
-from .bot import ChatBot
-from .config import Config
+"""Telegram 机器人
 
-__all__ = ['ChatBot', 'Config'] 
\ No newline at end of file
+ChatBot 在首次访问时才导入：chains.dispatch 等模块需要 src.bot.config，
+包导入时若加载 bot.py 会反过来导入 chains，形成循环导入。
+"""
+from importlib import import_module
+
+_EXPORTS = {
+    'ChatBot': '.bot',
+    'Config': '.config',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_EXPORTS[name], __name__), name)
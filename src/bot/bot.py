@@ -1,6 +1,10 @@
 import os
+import asyncio
 import logging
-from telegram import Update, MessageEntity, Chat
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+from telegram import Update, Chat
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -8,92 +12,337 @@ from telegram.ext import (
     filters,
     ContextTypes
 )
-from telegram.constants import ChatAction
-import random
-from ..chains.chat import ChatChain
-from ..memory.memory import GroupMemory
+from ..chains.dispatch import LLMOverloadedError, PRIORITY_RANDOM, llm_dispatcher
+from ..chains.prompt import ROLE_NAMES
+from ..memory.store import GroupMemoryStore, SQLiteMemoryBackend
+from ..utils.metrics import MetricsServer, dropped_replies, registry, stage_seconds
 from ..bot.config import Config
+from .prefilter import MessagePreFilter
+from .profiles import BotProfile
+from .scheduler import ChatScheduler
+from .reply import ProgressiveReply, keep_typing
+from .lifecycle import running_application
+from .sharding import consume_queue
+
+if TYPE_CHECKING:
+    from ..chains.base import BaseChain
+    from ..tools.crypto.prefetch import MarketDataPrefetcher
 
 logger = logging.getLogger(__name__)
 
+# 对话链和工具的本地数据进程内只创建、配置一次（多机器人模式下各机器人共用）
+_load_lock = threading.Lock()
+_tools_configured = False
+
+
+def _load_chain() -> "BaseChain":
+    """导入并创建共享的对话链（在线程池中运行）
+
+    LangChain、Gemini SDK、NumPy 和 aiohttp 工具模块都在这里才导入，
+    机器人不必等待它们就能开始接收更新。
+    """
+    global _tools_configured
+    from ..chains.registry import get_chain
+    from ..tools.crypto.archive import price_archive
+    from ..tools.crypto.coins import coin_index
+    with _load_lock:
+        if not _tools_configured:
+            # 价格历史归档，指标只增量同步新数据
+            price_archive.open(Config.PRICE_ARCHIVE_DIR)
+            # 币种索引，在这里（线程池中）加载，不在事件循环中读文件和建索引
+            coin_index.configure(Config.COIN_LIST_PATH, float(Config.COIN_LIST_REFRESH))
+            coin_index.load()
+            _tools_configured = True
+        return get_chain()
+
+
 class ChatBot:
-    def __init__(self):
-        """初始化机器人"""
-        # 使用 Config 类获取配置
-        self.token = Config.TELEGRAM_TOKEN
-        self.response_probability = float(Config.RESPONSE_PROBABILITY)
+    def __init__(self, profile: Optional[BotProfile] = None, owns_shared_resources: bool = True):
+        """初始化机器人
+
+        Args:
+            profile: 机器人配置档，为空时使用 Config
+            owns_shared_resources: 是否负责进程内共享资源（HTTP 连接池、指标端点、
+                行情预取）的启动和关闭；多机器人模式下只有第一个机器人负责
+        """
+        self.profile = profile or BotProfile.from_config()
+        self.owns_shared_resources = owns_shared_resources
+        self.token = self.profile.token
+        self.response_probability = self.profile.response_probability
         
         if not self.token:
             raise ValueError("Telegram bot token not found in environment variables")
         
-        # 创建应用
-        self.application = Application.builder().token(self.token).build()
+        # 创建应用（有界更新队列，限制同时处理的更新数）
+        builder = (
+            Application.builder()
+            .token(self.token)
+            .update_queue(asyncio.Queue(maxsize=int(Config.UPDATE_QUEUE_SIZE)))
+            .concurrent_updates(int(Config.CONCURRENT_UPDATES))
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+        )
+        if Config.TELEGRAM_API_URL:
+            builder = builder.base_url(Config.TELEGRAM_API_URL)
+        self.application = builder.build()
         
-        # 群组记忆
-        self.group_memories = {}
+        # 群组记忆：内存中有容量上限，淘汰的群组写入 SQLite
+        self.group_memories = GroupMemoryStore(
+            max_groups=int(Config.MEMORY_MAX_GROUPS),
+            idle_ttl=float(Config.MEMORY_IDLE_TTL),
+            max_messages=int(Config.MEMORY_MAX_MESSAGES),
+            backend=SQLiteMemoryBackend(self.profile.memory_db_path) if self.profile.memory_db_path else None,
+        )
+        
+        # 决定回复哪些消息，被忽略的消息只记入滚动记录
+        self.prefilter = MessagePreFilter(
+            self.response_probability,
+            cooldown=self.profile.random_reply_cooldown,
+            budget=self.profile.random_reply_budget,
+            transcript_size=self.profile.transcript_size,
+        )
+        
+        # 共享的对话链，进程内只创建一次；启动后在后台预热，第一条消息等待预热完成
+        self.chain: Optional["BaseChain"] = None
+        self._warm_up_task: Optional[asyncio.Task] = None
+        
+        # 流式回复配置
+        self.stream_responses = Config.STREAM_RESPONSES.lower() in ("1", "true", "yes")
+        self.stream_edit_interval = float(Config.STREAM_EDIT_INTERVAL)
+        
+        # 按群组排队、合并消息，并限制同时进行的 LLM 调用
+        self.scheduler = ChatScheduler(
+            self._respond_batch,
+            debounce=float(Config.RESPONSE_DEBOUNCE),
+            max_concurrency=int(Config.MAX_CONCURRENT_LLM),
+        )
+        
+        # 本地 /metrics 端点（可选）
+        metrics_port = int(Config.METRICS_PORT)
+        self.metrics_server = (
+            MetricsServer(registry, Config.METRICS_LISTEN, metrics_port)
+            if metrics_port > 0 and owns_shared_resources else None
+        )
+        
+        # 后台行情预取（可选）
+        self.prefetch_interval = float(Config.MARKET_PREFETCH_INTERVAL)
+        self._prefetcher: Optional["MarketDataPrefetcher"] = None
+        if self.prefetch_interval > 0 and owns_shared_resources:
+            self._schedule_prefetch()
         
         # 注册处理器
         self.application.add_handler(CommandHandler("start", self.start_command))
-        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        self.application.add_handler(MessageHandler(
+            filters.TEXT & ~filters.COMMAND & filters.ChatType.GROUPS,
+            self.handle_message
+        ))
+        
+        logger.info("Bot %s initialized with token: %s...", self.profile.name, self.token[:8])
+
+    def _schedule_prefetch(self):
+        """通过 JobQueue 定期刷新行情快照"""
+        job_queue = self.application.job_queue
+        if job_queue is None:
+            logger.warning(
+                "JobQueue not available, market prefetch disabled. "
+                "Install python-telegram-bot[job-queue] to enable it."
+            )
+            return
         
-        logger.info("Bot initialized with token: %s...", self.token[:8])
+        job_queue.run_repeating(
+            self._prefetch_market_data,
+            interval=self.prefetch_interval,
+            first=0,
+            name="market_prefetch"
+        )
+        logger.info("Market prefetch scheduled every %ss", self.prefetch_interval)
+
+    async def _prefetch_market_data(self, context: ContextTypes.DEFAULT_TYPE):
+        """JobQueue 回调：刷新行情快照"""
+        if self._prefetcher is None:
+            # 工具模块在预热时导入，等预热完成再导入预取模块，避免阻塞事件循环
+            await self.get_chain()
+            from ..tools.crypto.prefetch import MarketDataPrefetcher
+            self._prefetcher = MarketDataPrefetcher()
+            # 快照在两个刷新周期内有效，过期后回退到实时请求
+            self._prefetcher.snapshot.max_age = self.prefetch_interval * 2
+        await self._prefetcher.refresh()
+
+    def warm_up(self) -> asyncio.Task:
+        """在后台导入并创建对话链，重复调用返回同一个任务"""
+        if self._warm_up_task is None:
+            self._warm_up_task = asyncio.ensure_future(self._warm_up())
+        return self._warm_up_task
+
+    async def _warm_up(self) -> "BaseChain":
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        chain = await loop.run_in_executor(None, _load_chain)
+        if self.owns_shared_resources:
+            from ..tools.http import http_client
+            await http_client.start()
+        self.chain = chain
+        logger.info("Bot %s chain ready in %.2fs", self.profile.name, time.perf_counter() - started)
+        return chain
+
+    async def get_chain(self) -> "BaseChain":
+        """获取对话链，预热未完成时等待"""
+        if self.chain is not None:
+            return self.chain
+        task = self.warm_up()
+        try:
+            # 等待的消息被取消时不影响预热
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # 预热失败时下一条消息重试
+            if self._warm_up_task is task:
+                self._warm_up_task = None
+            raise
+
+    async def _post_init(self, application: Application):
+        """应用启动后初始化共享资源"""
+        # initialize() 已调用 getMe，缓存用户名供预筛选使用
+        self.prefilter.set_bot(application.bot.id, application.bot.username)
+        if self.metrics_server:
+            await self.metrics_server.start()
+        # 对话链在后台预热，不推迟开始接收更新
+        self.warm_up()
+
+    async def _post_shutdown(self, application: Application):
+        """应用关闭时释放共享资源"""
+        await self.scheduler.close()
+        self.group_memories.close()
+        if self._warm_up_task is not None and not self._warm_up_task.done():
+            self._warm_up_task.cancel()
+        # 对话链和 HTTP 连接池都在预热完成后才创建
+        if self.owns_shared_resources and self.chain is not None:
+            from ..tools.http import http_client
+            await self.chain.summarizer.close()
+            await http_client.close()
+        if self.metrics_server:
+            await self.metrics_server.stop()
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理 /start 命令"""
         await update.message.reply_text("你好！我是一个由 Gemini AI 驱动的加密货币助手。")
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """处理群组消息"""
+        """处理群组消息（处理器只接收群组中的文本消息）"""
         try:
             message = update.message
-            chat_id = message.chat_id
             
-            # 检查是否是群组消息
-            if not message.chat.type in ["group", "supergroup"]:
-                return
+            # 检查是否@机器人、回复机器人或随机回复
+            priority = self.prefilter.check(message)
+            if priority is not None:
+                logger.debug("Queueing message in group %s", message.chat_id)
+                self.scheduler.submit(message.chat_id, (message, priority))
             
-            # 获取或创建群组记忆
-            if chat_id not in self.group_memories:
-                self.group_memories[chat_id] = GroupMemory(chat_id)
+        except Exception as e:
+            logger.error("Error handling message: %s", e, exc_info=True)
+            await message.reply_text("抱歉，处理消息时出现错误。")
+
+    async def _respond_batch(self, chat_id: int, batch: list):
+        """回复同一群组中合并后的一批消息"""
+        messages = [message for message, _ in batch]
+        priority = min(priority for _, priority in batch)
+        last_message = messages[-1]
+        
+        # 队列过深时丢弃随机回复，保证@提及的响应速度
+        if llm_dispatcher.should_shed(priority):
+            logger.info("Dropped random reply in group %s: LLM queue is full", chat_id)
+            dropped_replies.inc(reason="llm_queue_full")
+            return
+        
+        try:
+            logger.debug("Processing %s message(s) in group %s", len(messages), chat_id)
             
-            memory = self.group_memories[chat_id]
-            chain = ChatChain(memory=memory)
+            # 获取或创建群组记忆，使用期间固定，不会被淘汰
+            with stage_seconds.time(stage="memory_get", chat_id=chat_id):
+                memory = await self.group_memories.get(chat_id)
+            self.group_memories.pin(chat_id)
             
-            # 检查是否@机器人或随机回复
-            bot_mentioned = False
-            if message.entities:
-                for entity in message.entities:
-                    if entity.type == MessageEntity.MENTION:
-                        mention = message.text[entity.offset:entity.offset + entity.length]
-                        if mention.replace("@", "") == context.bot.username:
-                            bot_mentioned = True
-                            break
+            # 流式模式下先发送第一段回答，之后逐步编辑
+            reply = ProgressiveReply(last_message, self.stream_edit_interval) if self.stream_responses else None
             
-            should_respond = bot_mentioned or (
-                random.random() < self.response_probability
+            # 随机插话时附上群里最近的消息，@提及和回复是直接提问，不需要
+            transcript = (
+                self.prefilter.transcript(chat_id, before=messages[0].message_id)
+                if priority == PRIORITY_RANDOM else ()
             )
             
-            if should_respond:
-                logger.info(f"Processing message in group {chat_id}")
-                # 发送"正在输入"状态
-                await context.bot.send_chat_action(
-                    chat_id=chat_id,
-                    action=ChatAction.TYPING
-                )
-                
-                # 处理消息
-                response = await chain.run(message.text)
-                await message.reply_text(response)
-                logger.info(f"Responded in group {chat_id}")
+            # 处理消息，期间持续显示"正在输入"
+            try:
+                with stage_seconds.time(stage="chain", chat_id=chat_id):
+                    async with keep_typing(self.application.bot, chat_id):
+                        chain = await self.get_chain()
+                        response = await chain.run(
+                            self._combine_messages(messages),
+                            memory=memory,
+                            priority=priority,
+                            on_partial=reply.update if reply else None,
+                            transcript=transcript,
+                            persona=self.profile.prompt
+                        )
+                # 后台摘要还会修改这份记忆，完成前保持固定
+                summary_task = chain.summarizer.running(chat_id)
+                if summary_task is not None:
+                    self.group_memories.pin(chat_id)
+                    summary_task.add_done_callback(lambda _: self.group_memories.release(chat_id))
+            finally:
+                self.group_memories.release(chat_id)
             
+            with stage_seconds.time(stage="telegram_send", chat_id=chat_id):
+                if reply:
+                    await reply.finish(response)
+                else:
+                    await last_message.reply_text(response)
+            self.prefilter.record(chat_id, last_message.message_id, ROLE_NAMES["assistant"], response)
+            logger.debug("Responded in group %s", chat_id)
+            
+        except LLMOverloadedError:
+            logger.info("Dropped random reply in group %s: LLM queue is full", chat_id)
+            dropped_replies.inc(reason="llm_queue_full")
         except Exception as e:
-            logger.error(f"Error handling message: {e}", exc_info=True)
-            await message.reply_text("抱歉，处理消息时出现错误。")
+            logger.error("Error responding in group %s: %s", chat_id, e, exc_info=True)
+            await last_message.reply_text("抱歉，处理消息时出现错误。")
+
+    @staticmethod
+    def _combine_messages(messages: list) -> str:
+        """将多条消息合并为一次输入"""
+        if len(messages) == 1:
+            return messages[0].text
+        lines = []
+        for message in messages:
+            name = message.from_user.first_name if message.from_user else "用户"
+            lines.append(f"{name}: {message.text}")
+        return "\n".join(lines)
 
     def run(self):
         """运行机器人"""
+        if Config.RUN_MODE == "webhook":
+            self.run_webhook()
+            return
+        
         logger.info("Starting bot...")
         self.application.run_polling(
             allowed_updates=Update.ALL_TYPES,
             drop_pending_updates=True
         )
+
+    def run_webhook(self):
+        """以 webhook 模式运行机器人"""
+        from .webhook import create_webhook_server
+        server = create_webhook_server(self.application)
+        logger.info("Starting bot in webhook mode...")
+        asyncio.run(server.run())
+
+    async def serve_queue(self, source_queue):
+        """作为分片 worker 运行：处理前端进程转发来的更新"""
+        async def enqueue(data):
+            update = Update.de_json(data, self.application.bot)
+            await self.application.update_queue.put(update)
+        
+        async with running_application(self.application):
+            await consume_queue(source_queue, enqueue)
@@ -2,42 +2,111 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
-# 获取配置文件路径
-config_dir = Path("config")
-env_file = config_dir / ".env"
+# 获取配置文件路径（容器中可通过 ENV_FILE 指定）
+env_file = Path(os.getenv("ENV_FILE", "config/.env"))
 
-# 加载环境变量
-if env_file.exists():
+# 加载环境变量，文件不存在时只使用进程环境变量，由 Config.validate() 检查必填项
+if env_file.is_file():
     load_dotenv(env_file)
-else:
-    raise FileNotFoundError(f"Environment file not found: {env_file}")
 
 class Config:
     """配置类"""
     
-    # Telegram 配置
+    # 多机器人模式：逗号分隔的机器人名称，每个机器人读取 config/<名称>/.env
+    BOTS = os.getenv("BOTS", "")
+    
+    # Telegram 配置（多机器人模式下在各机器人的配置中设置）
     TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-    if not TELEGRAM_TOKEN:
-        raise ValueError("TELEGRAM_TOKEN not found in environment variables")
     
     # Gemini 配置
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY not found in environment variables")
     
     # 机器人配置
     RESPONSE_PROBABILITY = os.getenv("RESPONSE_PROBABILITY", "0.3")
+    # 随机回复限制：同一群组的最小间隔（秒）和每小时次数上限（0 表示不限）
+    RANDOM_REPLY_COOLDOWN = os.getenv("RANDOM_REPLY_COOLDOWN", "60")
+    RANDOM_REPLY_BUDGET = os.getenv("RANDOM_REPLY_BUDGET", "10")
+    # 每个群组记录的最近消息条数，随机插话时作为上下文
+    TRANSCRIPT_SIZE = os.getenv("TRANSCRIPT_SIZE", "20")
     BOT_NAME = os.getenv("BOT_NAME", "default")
+    # 附加的人设/说明，加入提示词
+    BOT_PROMPT = os.getenv("BOT_PROMPT", "")
+    
+    # 运行模式：polling 或 webhook
+    RUN_MODE = os.getenv("RUN_MODE", "polling").lower()
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+    WEBHOOK_PORT = os.getenv("WEBHOOK_PORT", "8443")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    
+    # 日志配置：LOG_FORMAT 为 json 时每行输出一条 JSON；
+    # DEBUG 级别下代理的详细日志按 LOG_SAMPLE_RATE 抽样记录
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+    LOG_SAMPLE_RATE = os.getenv("LOG_SAMPLE_RATE", "0.1")
+    
+    # 指标端点，端口为 0 时不启动
+    METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+    METRICS_PORT = os.getenv("METRICS_PORT", "0")
+    
+    # Bot API 地址，使用自建 Bot API 服务器时设置，例如 http://127.0.0.1:8081/bot
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+    
+    # 更新处理配置
+    UPDATE_QUEUE_SIZE = os.getenv("UPDATE_QUEUE_SIZE", "1000")
+    CONCURRENT_UPDATES = os.getenv("CONCURRENT_UPDATES", "8")
+    # 大于 1 时按 chat_id 把群组分配给多个 worker 进程
+    WORKERS = os.getenv("WORKERS", "1")
+    
+    # 群组记忆配置
+    MEMORY_MAX_GROUPS = os.getenv("MEMORY_MAX_GROUPS", "1000")
+    MEMORY_IDLE_TTL = os.getenv("MEMORY_IDLE_TTL", "3600")
+    MEMORY_MAX_MESSAGES = os.getenv("MEMORY_MAX_MESSAGES", "10")
+    MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH", "data/memory.db")
+    
+    # 比特币价格历史的本地归档目录，为空时每次完整请求
+    PRICE_ARCHIVE_DIR = os.getenv("PRICE_ARCHIVE_DIR", "data/prices")
+    
+    # 币种列表的本地缓存文件和刷新间隔（秒），为空时只识别内置币种
+    COIN_LIST_PATH = os.getenv("COIN_LIST_PATH", "data/coins.json")
+    COIN_LIST_REFRESH = os.getenv("COIN_LIST_REFRESH", "86400")
+    
+    # 提示词配置：单次调用的输入 token 预算，以及每移出多少条消息更新一次历史摘要
+    PROMPT_TOKEN_BUDGET = os.getenv("PROMPT_TOKEN_BUDGET", "4000")
+    HISTORY_SUMMARY_BATCH = os.getenv("HISTORY_SUMMARY_BATCH", "6")
+    
+    # 回答缓存的条数上限，0 表示关闭
+    RESPONSE_CACHE_SIZE = os.getenv("RESPONSE_CACHE_SIZE", "1000")
+    
+    # 消息调度配置
+    RESPONSE_DEBOUNCE = os.getenv("RESPONSE_DEBOUNCE", "1.0")
+    MAX_CONCURRENT_LLM = os.getenv("MAX_CONCURRENT_LLM", "4")
+    
+    # Gemini 限流配置（0 表示不限制）
+    LLM_RPM = os.getenv("LLM_RPM", "15")
+    LLM_TPM = os.getenv("LLM_TPM", "1000000")
+    LLM_SHED_QUEUE_DEPTH = os.getenv("LLM_SHED_QUEUE_DEPTH", "5")
+    
+    # 流式回复配置
+    STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true")
+    STREAM_EDIT_INTERVAL = os.getenv("STREAM_EDIT_INTERVAL", "3")
+    
+    # 行情预取间隔（秒），0 表示关闭
+    MARKET_PREFETCH_INTERVAL = os.getenv("MARKET_PREFETCH_INTERVAL", "0")
     
     @classmethod
     def validate(cls):
         """验证配置"""
-        required_vars = [
-            ("TELEGRAM_TOKEN", cls.TELEGRAM_TOKEN),
-            ("GEMINI_API_KEY", cls.GEMINI_API_KEY),
-        ]
+        required_vars = [("GEMINI_API_KEY", cls.GEMINI_API_KEY)]
+        # 多机器人模式下 Token 在各机器人的配置中设置
+        if not cls.BOTS:
+            required_vars.append(("TELEGRAM_TOKEN", cls.TELEGRAM_TOKEN))
         
         missing = [var for var, val in required_vars if not val]
         
         if missing:
-            raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
\ No newline at end of file
+            raise ValueError(
+                f"Missing required environment variables: {', '.join(missing)} "
+                f"(set them in {env_file} or the process environment)"
+            )
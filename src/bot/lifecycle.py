@@ -0,0 +1,26 @@
+"""手动管理 Application 生命周期
+
+run_polling 之外的运行方式（webhook、分片 worker）需要自己调用
+initialize/start/stop/shutdown 以及对应的 post_* 回调。
+"""
+from contextlib import asynccontextmanager
+from telegram.ext import Application
+
+
+@asynccontextmanager
+async def running_application(application: Application):
+    """在上下文内保持 Application 运行"""
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    try:
+        yield application
+    finally:
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -1,5 +1,8 @@
 import os
 from .bot import ChatBot
+from .config import Config
+from .multi import MultiBotRunner
+from .sharding import ShardedBot
 from ..utils.logger import setup_logger
 
 def main():
@@ -7,15 +10,29 @@ def main():
     bot_name = os.environ.get("BOT_NAME", "default")
     
     # 设置日志
-    logger = setup_logger(bot_name)
-    logger.info(f"Starting bot: {bot_name}")
+    logger = setup_logger(
+        bot_name,
+        level=Config.LOG_LEVEL,
+        json_format=Config.LOG_FORMAT.lower() == "json",
+    )
+    logger.info("Starting bot: %s", bot_name)
     
     try:
+        # 检查必填配置（导入 Config 时不检查）
+        Config.validate()
+        
         # 创建并运行机器人
-        bot = ChatBot()
+        workers = int(Config.WORKERS)
+        bot_names = [name.strip() for name in Config.BOTS.split(",") if name.strip()]
+        if bot_names:
+            bot = MultiBotRunner.from_names(bot_names)
+        elif workers > 1:
+            bot = ShardedBot(workers, bot_name)
+        else:
+            bot = ChatBot()
         bot.run()
     except Exception as e:
-        logger.error(f"Bot crashed: {e}", exc_info=True)
+        logger.error("Bot crashed: %s", e, exc_info=True)
         raise
 
 if __name__ == "__main__":
@@ -0,0 +1,66 @@
+"""多机器人模式
+
+在一个进程、一个事件循环中运行多个机器人（长轮询）。每个机器人有
+自己的 Token、回复概率、人设、群组记忆和消息调度；对话链（LLM 客户端、
+工具、代理）、LLM 调度器、HTTP 连接池、行情和回答缓存、指标端点在
+进程内共享。
+"""
+from contextlib import AsyncExitStack
+from typing import List
+import asyncio
+import logging
+import signal
+from telegram import Update
+from .bot import ChatBot
+from .lifecycle import running_application
+from .profiles import BotProfile
+
+logger = logging.getLogger(__name__)
+
+
+class MultiBotRunner:
+    """在同一个事件循环中运行多个机器人"""
+
+    def __init__(self, profiles: List[BotProfile]):
+        if not profiles:
+            raise ValueError("No bots configured")
+        names = [profile.name for profile in profiles]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate bot names: {names}")
+        # 第一个机器人负责共享资源，最先启动、最后关闭
+        self.bots = [
+            ChatBot(profile, owns_shared_resources=(index == 0))
+            for index, profile in enumerate(profiles)
+        ]
+
+    @classmethod
+    def from_names(cls, names: List[str], config_dir: str = "config") -> "MultiBotRunner":
+        """按名称读取 config/<名称>/.env"""
+        return cls([BotProfile.load(name, config_dir) for name in names])
+
+    async def serve(self, stop: asyncio.Event) -> None:
+        """启动所有机器人并开始轮询，直到 stop 被设置"""
+        async with AsyncExitStack() as stack:
+            for bot in self.bots:
+                application = await stack.enter_async_context(running_application(bot.application))
+                await application.updater.start_polling(
+                    allowed_updates=Update.ALL_TYPES,
+                    drop_pending_updates=True
+                )
+                # 退出时先停止轮询，再停止 Application
+                stack.push_async_callback(application.updater.stop)
+                logger.info("Bot %s is polling", bot.profile.name)
+            await stop.wait()
+        logger.info("All bots stopped")
+
+    def run(self) -> None:
+        """运行直到收到 SIGINT/SIGTERM"""
+        async def main():
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, stop.set)
+            await self.serve(stop)
+
+        logger.info("Starting %s bots: %s", len(self.bots), ", ".join(bot.profile.name for bot in self.bots))
+        asyncio.run(main())
@@ -0,0 +1,137 @@
+"""群消息预筛选
+
+每条群消息最先经过这里，决定是否回复：
+- @机器人或回复机器人的消息总是回复
+- 其余消息按概率随机回复，并受每个群组的冷却时间和每小时次数限制
+
+被忽略的消息只记入一份很小的滚动记录（发送者和文本），回复时作为
+群聊上下文，不创建群组记忆。
+"""
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+import random
+import time
+from telegram import Message, MessageEntity
+from ..chains.dispatch import PRIORITY_MENTION, PRIORITY_RANDOM
+from ..utils.metrics import dropped_replies
+
+# 随机回复次数的统计窗口（秒）
+BUDGET_WINDOW = 3600
+
+# 保留滚动记录的群组数上限
+MAX_CHATS = 10000
+
+
+class _ChatState:
+    """单个群组的预筛选状态"""
+    __slots__ = ("transcript", "random_replies")
+
+    def __init__(self, transcript_size: int):
+        # (message_id, 发送者, 文本)
+        self.transcript: Deque[Tuple[int, str, str]] = deque(maxlen=transcript_size)
+        # 最近随机回复的时间
+        self.random_replies: Deque[float] = deque()
+
+
+class MessagePreFilter:
+    """决定哪些群消息需要回复"""
+
+    def __init__(
+        self,
+        response_probability: float,
+        cooldown: float = 60,
+        budget: int = 10,
+        transcript_size: int = 20,
+    ):
+        """
+        Args:
+            response_probability: 随机回复的概率
+            cooldown: 同一群组两次随机回复的最小间隔（秒）
+            budget: 每个群组每小时最多随机回复的次数，0 表示不限制
+            transcript_size: 每个群组保留的最近消息条数
+        """
+        self.response_probability = response_probability
+        self.cooldown = cooldown
+        self.budget = budget
+        self.transcript_size = transcript_size
+        self._bot_id: Optional[int] = None
+        self._mention: Optional[str] = None
+        self._chats: "OrderedDict[int, _ChatState]" = OrderedDict()
+
+    def set_bot(self, bot_id: int, username: str) -> None:
+        """缓存机器人的 ID 和用户名（Application 初始化后调用）"""
+        self._bot_id = bot_id
+        self._mention = f"@{username}".lower()
+
+    def _state(self, chat_id: int) -> _ChatState:
+        state = self._chats.get(chat_id)
+        if state is None:
+            state = self._chats[chat_id] = _ChatState(self.transcript_size)
+            if len(self._chats) > MAX_CHATS:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return state
+
+    def record(self, chat_id: int, message_id: int, sender: str, text: str) -> None:
+        """记入滚动记录"""
+        if self.transcript_size > 0:
+            self._state(chat_id).transcript.append((message_id, sender, text))
+
+    def transcript(self, chat_id: int, before: Optional[int] = None) -> List[str]:
+        """获取群组最近的消息，before 为消息 ID 时只取更早的消息"""
+        state = self._chats.get(chat_id)
+        if state is None:
+            return []
+        return [
+            f"{sender}: {text}"
+            for message_id, sender, text in state.transcript
+            if before is None or message_id < before
+        ]
+
+    def is_addressed(self, message: Message) -> bool:
+        """是否@了机器人或回复了机器人的消息"""
+        reply = message.reply_to_message
+        if reply is not None and reply.from_user is not None and reply.from_user.id == self._bot_id:
+            return True
+        text = message.text
+        if not message.entities or self._mention is None or "@" not in text:
+            return False
+        # 先做一次子串判断，命中后再核对实体
+        if self._mention not in text.lower():
+            return any(
+                entity.type == MessageEntity.TEXT_MENTION
+                and entity.user is not None
+                and entity.user.id == self._bot_id
+                for entity in message.entities
+            )
+        return any(
+            entity.type == MessageEntity.MENTION
+            and text[entity.offset:entity.offset + entity.length].lower() == self._mention
+            for entity in message.entities
+        )
+
+    def check(self, message: Message) -> Optional[int]:
+        """记录消息并返回回复优先级，不需要回复时返回 None"""
+        chat_id = message.chat_id
+        sender = message.from_user.first_name if message.from_user else "用户"
+        self.record(chat_id, message.message_id, sender, message.text)
+
+        if self.is_addressed(message):
+            return PRIORITY_MENTION
+
+        if random.random() >= self.response_probability:
+            return None
+
+        now = time.monotonic()
+        replies = self._state(chat_id).random_replies
+        while replies and now - replies[0] > BUDGET_WINDOW:
+            replies.popleft()
+        if replies and now - replies[-1] < self.cooldown:
+            dropped_replies.inc(reason="cooldown")
+            return None
+        if self.budget > 0 and len(replies) >= self.budget:
+            dropped_replies.inc(reason="budget")
+            return None
+        replies.append(now)
+        return PRIORITY_RANDOM
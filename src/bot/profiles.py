@@ -0,0 +1,83 @@
+"""机器人配置档
+
+单机器人模式下配置档来自 Config（config/.env 和环境变量）。
+多机器人模式下每个机器人读取 config/<名称>/.env，只包含该机器人
+自己的设置，未设置的项沿用共享的 Config。
+"""
+from pathlib import Path
+from typing import Dict, Optional
+from dotenv import dotenv_values
+from .config import Config
+
+
+class BotProfile:
+    """单个机器人独立的设置"""
+
+    def __init__(
+        self,
+        name: str,
+        token: str,
+        response_probability: float = 0.3,
+        prompt: str = "",
+        random_reply_cooldown: float = 60,
+        random_reply_budget: int = 10,
+        transcript_size: int = 20,
+        memory_db_path: str = "",
+    ):
+        """
+        Args:
+            name: 机器人名称（日志和数据目录使用）
+            token: Telegram Bot Token
+            response_probability: 随机回复概率
+            prompt: 附加的人设/说明，加入该机器人的提示词
+            random_reply_cooldown: 同一群组两次随机回复的最小间隔（秒）
+            random_reply_budget: 每个群组每小时最多随机回复的次数
+            transcript_size: 每个群组记录的最近消息条数
+            memory_db_path: 群组记忆的 SQLite 文件，为空时不持久化
+        """
+        self.name = name
+        self.token = token
+        self.response_probability = response_probability
+        self.prompt = prompt
+        self.random_reply_cooldown = random_reply_cooldown
+        self.random_reply_budget = random_reply_budget
+        self.transcript_size = transcript_size
+        self.memory_db_path = memory_db_path
+
+    @classmethod
+    def from_settings(cls, name: str, settings: Dict[str, Optional[str]]) -> "BotProfile":
+        """从设置字典创建，缺少的项使用 Config 中的值"""
+        def get(key: str) -> str:
+            value = settings.get(key)
+            return value if value is not None else getattr(Config, key)
+
+        token = settings.get("TELEGRAM_TOKEN")
+        if not token:
+            raise ValueError(f"TELEGRAM_TOKEN not found for bot {name}")
+        return cls(
+            name=name,
+            token=token,
+            response_probability=float(get("RESPONSE_PROBABILITY")),
+            prompt=get("BOT_PROMPT"),
+            random_reply_cooldown=float(get("RANDOM_REPLY_COOLDOWN")),
+            random_reply_budget=int(get("RANDOM_REPLY_BUDGET")),
+            transcript_size=int(get("TRANSCRIPT_SIZE")),
+            # 各机器人的群组记忆分开存放
+            memory_db_path=settings.get("MEMORY_DB_PATH", str(Path("data") / name / "memory.db")),
+        )
+
+    @classmethod
+    def from_config(cls) -> "BotProfile":
+        """单机器人模式：使用 Config"""
+        return cls.from_settings(
+            Config.BOT_NAME,
+            {"TELEGRAM_TOKEN": Config.TELEGRAM_TOKEN, "MEMORY_DB_PATH": Config.MEMORY_DB_PATH},
+        )
+
+    @classmethod
+    def load(cls, name: str, config_dir: str = "config") -> "BotProfile":
+        """多机器人模式：读取 config/<name>/.env"""
+        env_file = Path(config_dir) / name / ".env"
+        if not env_file.exists():
+            raise FileNotFoundError(f"Environment file not found: {env_file}")
+        return cls.from_settings(name, dotenv_values(env_file))
@@ -0,0 +1,89 @@
+"""Telegram 回复辅助：流式编辑回复和持续的"正在输入"状态"""
+from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
+import logging
+import time
+from telegram import Bot, Message
+from telegram.constants import ChatAction, MessageLimit
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressiveReply:
+    """先尽早发送第一段回答，之后按节流间隔编辑同一条消息"""
+
+    def __init__(self, message: Message, edit_interval: float = 3.0):
+        self.message = message
+        # Telegram 对同一群组的编辑频率有限制
+        self.edit_interval = edit_interval
+        self._sent: Optional[Message] = None
+        self._last_text = ""
+        self._last_edit = 0.0
+
+    @property
+    def started(self) -> bool:
+        """是否已发送第一段回答"""
+        return self._sent is not None
+
+    async def update(self, text: str) -> None:
+        """收到新的部分回答，发送失败不影响回答的生成"""
+        text = text[:MessageLimit.MAX_TEXT_LENGTH]
+        if not text or text == self._last_text:
+            return
+        try:
+            if self._sent is None:
+                self._sent = await self.message.reply_text(text)
+                self._last_text = text
+                self._last_edit = time.monotonic()
+            elif time.monotonic() - self._last_edit >= self.edit_interval:
+                await self._edit(text)
+        except Exception as e:
+            logger.warning("Failed to send partial reply: %s", e)
+
+    async def finish(self, text: str) -> None:
+        """发送或编辑为最终回答"""
+        text = text[:MessageLimit.MAX_TEXT_LENGTH]
+        if self._sent is None:
+            await self.message.reply_text(text)
+        elif text != self._last_text:
+            await self._edit(text)
+
+    async def _edit(self, text: str) -> None:
+        self._last_edit = time.monotonic()
+        try:
+            await self._sent.edit_text(text)
+            self._last_text = text
+        except BadRequest as e:
+            # 内容未变化等情况忽略
+            logger.debug("Edit skipped: %s", e)
+
+
+@asynccontextmanager
+async def keep_typing(bot: Bot, chat_id: int, interval: float = 4.0):
+    """在上下文内持续发送"正在输入"状态（Telegram 约 5 秒后自动清除）"""
+    # 取消可能在 HTTP 请求内部被吞掉，循环同时检查停止标志
+    stopped = asyncio.Event()
+
+    async def _loop():
+        while not stopped.is_set():
+            try:
+                await bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+            except Exception as e:
+                logger.debug("send_chat_action failed: %s", e)
+            try:
+                await asyncio.wait_for(stopped.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    task = asyncio.create_task(_loop())
+    try:
+        yield
+    finally:
+        stopped.set()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
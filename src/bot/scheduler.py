@@ -0,0 +1,60 @@
+"""按群组调度需要回复的消息
+
+- 同一个群组的消息串行处理，群组记忆不会被并发修改
+- 去抖窗口内同一群组的多条消息合并为一次 LLM 调用
+- 全局限制同时进行的 LLM 调用数量
+"""
+from typing import Any, Awaitable, Callable, Dict, List
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 处理函数：接收群组 ID 和合并后的一批消息
+BatchHandler = Callable[[int, List[Any]], Awaitable[None]]
+
+
+class ChatScheduler:
+    """按群组排队并合并消息的调度器"""
+
+    def __init__(self, handler: BatchHandler, debounce: float = 1.0, max_concurrency: int = 4):
+        self.handler = handler
+        self.debounce = debounce
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending: Dict[int, List[Any]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    @property
+    def active_chats(self) -> int:
+        """正在处理或等待处理的群组数"""
+        return len(self._workers)
+
+    def submit(self, chat_id: int, item: Any) -> None:
+        """提交一条待回复的消息"""
+        self._pending.setdefault(chat_id, []).append(item)
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._worker(chat_id))
+
+    async def _worker(self, chat_id: int) -> None:
+        """逐批处理某个群组的消息，直到没有待处理消息"""
+        try:
+            while self._pending.get(chat_id):
+                # 等待去抖窗口，收集同一群组的后续消息
+                if self.debounce > 0:
+                    await asyncio.sleep(self.debounce)
+                batch = self._pending.pop(chat_id)
+                async with self._semaphore:
+                    try:
+                        await self.handler(chat_id, batch)
+                    except Exception as e:
+                        logger.error("Error handling batch in group %s: %s", chat_id, e, exc_info=True)
+        finally:
+            self._workers.pop(chat_id, None)
+            self._pending.pop(chat_id, None)
+
+    async def close(self) -> None:
+        """取消所有未完成的任务"""
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
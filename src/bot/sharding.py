@@ -0,0 +1,178 @@
+"""按 chat_id 分片的多进程部署
+
+前端进程（轮询或 webhook）只负责接收更新，按 chat_id 哈希把更新转发给
+N 个 worker 进程之一。每个 worker 运行完整的 ChatBot，只处理属于自己的
+群组，群组记忆也只保存在该 worker 中（每个 worker 使用自己的 SQLite 文件）。
+
+worker 忽略 SIGINT，由前端进程通过队列中的 None 通知退出，处理中的消息
+可以正常完成。
+"""
+from pathlib import Path
+from typing import Any, Callable, Sequence
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# worker 入口：target(index, queue, *args)
+WorkerTarget = Callable[..., None]
+
+# worker 读取队列的超时时间（秒），线程池中的线程不会一直阻塞在 get 上
+QUEUE_POLL_INTERVAL = 1.0
+
+
+def shard_for(chat_id: int, workers: int) -> int:
+    """计算 chat_id 所属的分片（同一群组总是落到同一个 worker）"""
+    return chat_id % workers
+
+
+def shard_path(path: str, index: int) -> str:
+    """worker 各自的文件路径：data/memory.db -> data/memory.worker-0.db"""
+    if not path:
+        return path
+    original = Path(path)
+    return str(original.with_name(f"{original.stem}.worker-{index}{original.suffix}"))
+
+
+class ShardDispatcher:
+    """管理 worker 进程及其消息队列"""
+
+    def __init__(
+        self,
+        workers: int,
+        target: WorkerTarget,
+        args: Sequence[Any] = (),
+        queue_size: int = 1000,
+    ):
+        self.workers = workers
+        # spawn 启动，避免复制前端进程的事件循环和连接
+        context = multiprocessing.get_context("spawn")
+        self.queues = [context.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.processes = [
+            context.Process(
+                target=target,
+                args=(index, self.queues[index], *args),
+                name=f"shard-worker-{index}",
+                daemon=True,
+            )
+            for index in range(workers)
+        ]
+
+    def start(self) -> None:
+        for process in self.processes:
+            process.start()
+        logger.info("Started %s shard workers", self.workers)
+
+    async def dispatch(self, chat_id: int, payload: Any) -> None:
+        """把消息发送给 chat_id 对应的 worker，队列满时等待"""
+        target_queue = self.queues[shard_for(chat_id, self.workers)]
+        try:
+            target_queue.put_nowait(payload)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, target_queue.put, payload)
+
+    def stop(self, timeout: float = 10) -> None:
+        """通知所有 worker 退出并等待结束"""
+        for target_queue in self.queues:
+            try:
+                target_queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        logger.info("Shard workers stopped")
+
+
+async def consume_queue(source_queue, handle: Callable[[Any], Any]) -> None:
+    """在 worker 中读取队列直到收到 None"""
+    loop = asyncio.get_running_loop()
+    while True:
+        # 带超时读取：事件循环退出时线程池能及时结束，不会卡在没有消息的 get 上
+        try:
+            payload = await loop.run_in_executor(None, source_queue.get, True, QUEUE_POLL_INTERVAL)
+        except queue.Empty:
+            # 前端进程意外退出、收不到 None 时也结束
+            parent = multiprocessing.parent_process()
+            if parent is not None and not parent.is_alive():
+                logger.warning("Shard front exited, stopping worker")
+                break
+            continue
+        if payload is None:
+            break
+        await handle(payload)
+
+
+def run_bot_worker(index: int, source_queue, bot_name: str) -> None:
+    """worker 进程入口：运行 ChatBot 并处理转发来的更新"""
+    from ..utils.logger import setup_logger
+    from .bot import ChatBot
+
+    setup_logger(
+        f"{bot_name}/worker-{index}",
+        level=Config.LOG_LEVEL,
+        json_format=Config.LOG_FORMAT.lower() == "json",
+    )
+    # Ctrl+C 会发给整个进程组，由前端进程发送 None 通知 worker 退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # 每个 worker 使用独立的指标端口和群组记忆文件（SQLite 同一时间只允许一个写入者）
+    if int(Config.METRICS_PORT) > 0:
+        Config.METRICS_PORT = str(int(Config.METRICS_PORT) + index)
+    Config.MEMORY_DB_PATH = shard_path(Config.MEMORY_DB_PATH, index)
+    logger.info("Shard worker %s starting", index)
+    bot = ChatBot()
+    asyncio.run(bot.serve_queue(source_queue))
+
+
+class ShardedBot:
+    """前端进程：接收更新并按 chat_id 分发给 worker"""
+
+    def __init__(self, workers: int, bot_name: str):
+        self.dispatcher = ShardDispatcher(
+            workers,
+            run_bot_worker,
+            args=(bot_name,),
+            queue_size=int(Config.UPDATE_QUEUE_SIZE),
+        )
+        builder = (
+            Application.builder()
+            .token(Config.TELEGRAM_TOKEN)
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+        )
+        if Config.TELEGRAM_API_URL:
+            builder = builder.base_url(Config.TELEGRAM_API_URL)
+        self.application = builder.build()
+        self.application.add_handler(TypeHandler(Update, self.forward_update))
+
+    async def _post_init(self, application: Application):
+        self.dispatcher.start()
+
+    async def _post_shutdown(self, application: Application):
+        await asyncio.get_running_loop().run_in_executor(None, self.dispatcher.stop)
+
+    async def forward_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """转发更新给对应的 worker"""
+        chat = update.effective_chat
+        await self.dispatcher.dispatch(chat.id if chat else 0, update.to_dict())
+
+    def run(self):
+        """运行前端进程"""
+        if Config.RUN_MODE == "webhook":
+            from .webhook import create_webhook_server
+            logger.info("Starting shard front in webhook mode...")
+            asyncio.run(create_webhook_server(self.application).run())
+            return
+        
+        logger.info("Starting shard front...")
+        self.application.run_polling(
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True
+        )
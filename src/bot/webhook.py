@@ -0,0 +1,126 @@
+"""Webhook 模式
+
+用本地 aiohttp 服务器接收 Telegram 推送的更新，替代长轮询。
+请求需携带 set_webhook 时设置的 secret token，更新放入有界队列，
+队列满时返回 503 让 Telegram 稍后重试。
+"""
+from typing import Optional
+import asyncio
+import hmac
+import logging
+import secrets
+import signal
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+from .config import Config
+from .lifecycle import running_application
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """接收 Telegram 更新的 aiohttp 服务器"""
+
+    def __init__(
+        self,
+        application: Application,
+        url: str,
+        secret_token: str,
+        listen: str = "0.0.0.0",
+        port: int = 8443,
+        path: str = "telegram",
+    ):
+        self.application = application
+        self.url = url.rstrip("/") + "/" + path.strip("/")
+        self.secret_token = secret_token
+        self.listen = listen
+        self.port = port
+        self.path = "/" + path.strip("/")
+        self._runner: Optional[web.AppRunner] = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get("/healthz", self.handle_health)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """接收一条更新并放入更新队列"""
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token, self.secret_token):
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except Exception as e:
+            logger.warning("Invalid webhook payload: %s", e)
+            return web.Response(status=400)
+
+        try:
+            self.application.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning("Update queue is full, asking Telegram to retry")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    async def start(self) -> None:
+        """启动 HTTP 服务器并向 Telegram 注册 webhook"""
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.listen, self.port)
+        await site.start()
+        await self.application.bot.set_webhook(
+            url=self.url,
+            secret_token=self.secret_token,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True,
+        )
+        logger.info("Webhook listening on %s:%s%s", self.listen, self.port, self.path)
+
+    async def stop(self) -> None:
+        """停止 HTTP 服务器"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def run(self) -> None:
+        """运行应用直到收到停止信号"""
+        application = self.application
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass
+
+        async with running_application(application):
+            try:
+                await self.start()
+                await stop_event.wait()
+            finally:
+                await self.stop()
+
+
+def create_webhook_server(application: Application) -> WebhookServer:
+    """按配置创建 webhook 服务器"""
+    if not Config.WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL is required in webhook mode")
+
+    # 未配置密钥时每次启动随机生成
+    secret_token = Config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    return WebhookServer(
+        application,
+        url=Config.WEBHOOK_URL,
+        secret_token=secret_token,
+        listen=Config.WEBHOOK_LISTEN,
+        port=int(Config.WEBHOOK_PORT),
+        path=Config.WEBHOOK_PATH,
+    )
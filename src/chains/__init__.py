@@ -1,4 +1,21 @@
-from .base import BaseChain
-from .chat import ChatChain
+"""对话链
 
-__all__ = ['BaseChain', 'ChatChain'] 
\ No newline at end of file
+base/chat 导入 LangChain、Gemini SDK 和全部工具，较慢；包内的轻量模块
+（调度器、路由、提示词）经常单独导入，所以这里的名称在首次访问时才导入。
+"""
+from importlib import import_module
+
+_EXPORTS = {
+    'BaseChain': '.base',
+    'ChatChain': '.chat',
+    'get_chain': '.registry',
+    'clear_chains': '.registry',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_EXPORTS[name], __name__), name)
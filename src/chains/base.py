@@ -1,26 +1,42 @@
 from langchain.chains import LLMChain
-from langchain.memory import ConversationBufferMemory
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import AgentExecutor, create_react_agent
 from langchain.agents.format_scratchpad import format_to_openai_function_messages
 from langchain.agents.output_parsers import ReActJsonSingleInputOutputParser
+from langchain.tools.render import render_text_description
 import google.generativeai as genai
 from ..bot.config import Config
+from ..memory.memory import GroupMemory
+from .dispatch import LLMOverloadedError, PRIORITY_MENTION, llm_priority
+from .model import DispatchedChatModel
+from .prompt import PromptAssembler, count_tokens
+from .response_cache import ResponseCache
+from .streaming import FinalAnswerStreamHandler, PartialCallback
+from .summary import HistorySummarizer
+from .router import INTENT_PRICE, IntentRouter, Route
 from ..tools import CryptoPriceTool, CryptoAnalysisTool
-from typing import Dict, Any, Optional
+from ..tools.result import ToolResult
+from ..utils.logger import sampled
+from ..utils.metrics import stage_seconds
+from typing import Dict, Any, Optional, Sequence
 import logging
 import re
 
 logger = logging.getLogger(__name__)
 
 class BaseChain:
-    def __init__(self, memory=None):
+    """可复用的对话链
+
+    LLM、工具和代理在构造时创建一次，之后由所有群组共享；
+    群组记忆在调用 run 时传入。
+    """
+
+    def __init__(self):
         # 配置 Google Gemini
         genai.configure(api_key=Config.GEMINI_API_KEY)
         
-        # 创建 LLM
-        self.llm = ChatGoogleGenerativeAI(
+        # 创建 LLM（所有调用经过全局调度器限流）
+        self.llm = DispatchedChatModel(
             model="gemini-exp-1206",
             temperature=0.3,
             max_tokens=2048,
@@ -32,135 +48,255 @@ class BaseChain:
             CryptoPriceTool(),
             CryptoAnalysisTool()
         ]
+        self._tools_by_name = {tool.name: tool for tool in self.tools}
         
-        # 使用传入的记忆或创建新的
-        self.memory = memory.memory if memory else ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
+        # 意图路由，明确的请求直接调用工具
+        self.router = IntentRouter()
+        
+        # 跨群组共享的回答缓存
+        self.response_cache = ResponseCache(maxsize=int(Config.RESPONSE_CACHE_SIZE))
         
         # 创建代理
         prompt = self._create_prompt()
-        logger.info("=== Prompt Template ===")
-        logger.info(prompt.template)
+        logger.debug("Prompt template:\n%s", prompt.template)
         
+        # 显式开启流式：以 ainvoke 调用模型的 AgentExecutor 不会触发 on_llm_new_token，
+        # FinalAnswerStreamHandler 收不到 token
         self.agent = create_react_agent(
-            llm=self.llm,
+            llm=self.llm.bind(stream=True),
             tools=self.tools,
             prompt=prompt
         )
         
-        # 配置执行器
+        # 聊天历史按 token 预算截取，静态部分（说明、工具、示例）固定在提示词开头
+        self.prompt_assembler = PromptAssembler(
+            budget=int(Config.PROMPT_TOKEN_BUDGET),
+            static_tokens=count_tokens(self._static_prompt(prompt)),
+        )
+        self.summarizer = HistorySummarizer(
+            self.llm,
+            batch_size=int(Config.HISTORY_SUMMARY_BATCH),
+        )
+        
+        # 配置执行器（不绑定记忆，记忆在调用时传入）
         self.agent_executor = AgentExecutor(
             agent=self.agent,
             tools=self.tools,
-            memory=self.memory,
-            verbose=True,
+            verbose=False,
             handle_parsing_errors=True,
             max_iterations=2,
             max_execution_time=None,
         )
 
-    async def run(self, input_text):
-        """运行代理并返回结果"""
+    async def run(
+        self,
+        input_text,
+        memory=None,
+        priority: int = PRIORITY_MENTION,
+        on_partial: Optional[PartialCallback] = None,
+        use_cache: bool = True,
+        transcript: Sequence[str] = (),
+        persona: str = ""
+    ):
+        """运行代理并返回结果
+
+        Args:
+            input_text: 用户输入
+            memory: 群组记忆（GroupMemory），为空时使用临时记忆
+            priority: LLM 调用优先级，队列过深时低优先级请求抛出 LLMOverloadedError
+            on_partial: 流式回调，生成过程中接收当前已生成的回答
+            use_cache: 为 False 时不读写回答缓存（回答依赖上下文时）
+            transcript: 群里最近的其他消息，作为回答的上下文；提供时不使用回答缓存
+            persona: 机器人的人设/说明（多机器人模式下各机器人不同）
+        """
+        if memory is None:
+            memory = GroupMemory(chat_id=0)
+        chat_id = memory.group_id
+        priority_token = llm_priority.set(priority)
         try:
             # 检查是否需要使用工具
-            if not self._needs_tools(input_text):
+            with stage_seconds.time(stage="route", chat_id=chat_id):
+                route = self.router.route(input_text)
+            logger.debug("Route: %r", route)
+            
+            # 其他群组问过的相同问题直接返回缓存的回答
+            use_cache = use_cache and not transcript
+            cache_key = self.response_cache.key(input_text, route, persona) if use_cache else None
+            if cache_key is not None:
+                response = self.response_cache.get(cache_key)
+                if response is not None:
+                    if route.needs_tools:
+                        memory.save_context({"input": input_text}, {"output": response})
+                    return response
+            
+            if not route.needs_tools:
                 # 直接使用 LLM 回答
-                response = await self._direct_response(input_text)
+                with stage_seconds.time(stage="direct_llm", chat_id=chat_id):
+                    context = self.prompt_assembler.render_transcript(transcript, input_text) if transcript else ""
+                    response = await self._direct_response(input_text, on_partial, context, persona)
+                if cache_key is not None:
+                    self.response_cache.set(cache_key, route.intent, response)
+                return response
+            
+            # 明确的价格/分析请求直接调用工具，不经过 LLM
+            if route.is_direct:
+                with stage_seconds.time(stage="direct_tool", chat_id=chat_id):
+                    result = await self._run_tool(route)
+                response = result.text
+                # 上游出错或数据不完整的回答不缓存，下一次重新查询
+                if cache_key is not None and result.complete:
+                    self.response_cache.set(cache_key, route.intent, response)
+                memory.save_context({"input": input_text}, {"output": response})
+                self.summarizer.maybe_schedule(memory)
                 return response
             
             # 使用代理处理需要工具的请求
             max_retries = 2
             for attempt in range(max_retries):
                 try:
-                    logger.info(f"=== Attempt {attempt + 1} ===")
-                    logger.info(f"Input Text: {input_text}")
+                    # 详细日志只抽样记录
+                    verbose = logger.isEnabledFor(logging.DEBUG) and sampled(float(Config.LOG_SAMPLE_RATE))
+                    if verbose:
+                        logger.debug("Attempt %s, input: %s", attempt + 1, input_text)
                     
-                    # 获取当前记忆内容
-                    memory_vars = self.memory.load_memory_variables({})
-                    logger.info("\n--- Current Memory ---")
-                    if "chat_history" in memory_vars:
-                        chat_history = memory_vars["chat_history"]
-                        logger.info("Chat History:")
-                        for msg in chat_history:
-                            logger.info(f"{msg.type}: {msg.content}")
+                    # 在 token 预算内渲染聊天历史
+                    with stage_seconds.time(stage="memory_load", chat_id=chat_id):
+                        chat_history = self.prompt_assembler.render_history(memory, input_text, transcript)
+                    if verbose:
+                        logger.debug("Chat history:\n%s", chat_history)
                     
-                    # 执行代理
-                    result = await self.agent_executor.ainvoke(
-                        {
-                            "input": input_text,
-                            "chat_history": memory_vars.get("chat_history", []),
-                        }
-                    )
+                    # 执行代理，流式模式下转发最终回答
+                    callbacks = [FinalAnswerStreamHandler(on_partial)] if on_partial else None
+                    with stage_seconds.time(stage="agent", chat_id=chat_id):
+                        result = await self.agent_executor.ainvoke(
+                            {
+                                "input": input_text,
+                                "chat_history": chat_history,
+                                "persona": self._persona_block(persona),
+                            },
+                            config={"callbacks": callbacks}
+                        )
                     
-                    logger.info("\n--- Agent Result ---")
-                    logger.info(f"Output: {result.get('output', 'No output')}")
-                    if "intermediate_steps" in result:
-                        logger.info(f"Steps: {result['intermediate_steps']}")
+                    if verbose:
+                        logger.debug("Agent output: %s", result.get("output", "No output"))
+                        if "intermediate_steps" in result:
+                            logger.debug("Agent steps: %s", result["intermediate_steps"])
                     
                     if isinstance(result, dict) and "output" in result:
-                        logger.info("\n--- Final Output ---")
-                        logger.info(result["output"])
+                        memory.save_context(
+                            {"input": input_text},
+                            {"output": result["output"]}
+                        )
+                        self.summarizer.maybe_schedule(memory)
                         return result["output"]
                     
+                except LLMOverloadedError:
+                    raise
                 except Exception as e:
-                    logger.error(f"Error in attempt {attempt + 1}", exc_info=True)
+                    logger.error("Error in attempt %s", attempt + 1, exc_info=True)
                     if attempt == max_retries - 1:
                         raise
             
             return "抱歉，我现在无法处理这个请求。"
             
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             logger.error("Final error", exc_info=True)
             return "抱歉，处理您的请求时出现了错误。请稍后再试。"
+        finally:
+            llm_priority.reset(priority_token)
 
-    def _needs_tools(self, input_text: str) -> bool:
-        """检查是否需要使用工具"""
-        # 检查是否包含加密货币相关关键词
-        crypto_keywords = [
-            'btc', 'bitcoin', '比特币',
-            'eth', 'ethereum', '以太坊',
-            '价格', 'price', '分析', 'analysis',
-            '走势', '市场', 'market',
-            '币', 'coin', 'crypto'
-        ]
-        
-        return any(keyword in input_text.lower() for keyword in crypto_keywords)
+    async def _run_tool(self, route: Route) -> ToolResult:
+        """根据路由结果直接调用工具"""
+        if route.intent == INTENT_PRICE:
+            return await self._tools_by_name["crypto_price"].query(
+                " ".join(route.crypto_ids),
+                ",".join(route.currencies or ["usd"]),
+            )
+        return await self._tools_by_name["crypto_analysis"].query(
+            route.crypto_ids[0],
+            route.indicators or ["all"],
+        )
+
+    async def _direct_response(
+        self,
+        input_text: str,
+        on_partial: Optional[PartialCallback] = None,
+        context: str = "",
+        persona: str = ""
+    ) -> str:
+        """直接使用 LLM 回答，提供 on_partial 时流式生成
 
-    async def _direct_response(self, input_text: str) -> str:
-        """直接使用 LLM 回答"""
+        Args:
+            input_text: 用户输入
+            on_partial: 流式回调
+            context: 群里最近的消息（已渲染），为空时不附加
+            persona: 机器人的人设/说明，为空时不附加
+        """
         try:
             # 创建简单的提示模板
             template = """你是一个友好的群聊助手。请用简洁的语言回答用户的问题。
 
-用户输入：{input}
+{persona}{context}用户输入：{input}
 
 请回答："""
             
             prompt = PromptTemplate(
                 template=template,
-                input_variables=["input"]
+                input_variables=["persona", "context", "input"]
             )
+            persona = self._persona_block(persona)
+            context = f"{context}\n\n" if context else ""
+            
+            if on_partial is not None:
+                # 流式获取回答
+                response = ""
+                async for chunk in self.llm.astream(prompt.format(persona=persona, context=context, input=input_text)):
+                    response += chunk.content
+                    partial = self._clean_response(response)
+                    if partial:
+                        await on_partial(partial)
+                return self._clean_response(response)
             
             # 创建简单的链
             chain = LLMChain(llm=self.llm, prompt=prompt)
             
             # 获取回答
-            response = await chain.arun(input=input_text)
+            response = await chain.arun(persona=persona, context=context, input=input_text)
             
-            # 清理回答（移除多余的换行等）
-            response = re.sub(r'\n+', '\n', response).strip()
-            
-            return response
+            return self._clean_response(response)
             
+        except LLMOverloadedError:
+            raise
         except Exception as e:
-            logger.error(f"Error in direct response: {e}", exc_info=True)
+            logger.error("Error in direct response: %s", e, exc_info=True)
             return "抱歉，我现在无法回答这个问题。"
 
+    @staticmethod
+    def _persona_block(persona: str) -> str:
+        """提示词中的人设部分"""
+        return f"机器人设定：{persona}\n\n" if persona else ""
+
+    @staticmethod
+    def _clean_response(response: str) -> str:
+        """清理回答（移除多余的换行等）"""
+        return re.sub(r'\n+', '\n', response).strip()
+
+    def _static_prompt(self, prompt: PromptTemplate) -> str:
+        """提示词中每次调用都相同的部分"""
+        return prompt.format(
+            tools=render_text_description(self.tools),
+            tool_names=", ".join(tool.name for tool in self.tools),
+            chat_history="",
+            persona="",
+            input="",
+            agent_scratchpad="",
+        )
+
     def _create_prompt(self):
         return PromptTemplate(
-            input_variables=["chat_history", "input", "agent_scratchpad", "tool_names", "tools"],
+            input_variables=["chat_history", "persona", "input", "agent_scratchpad", "tool_names", "tools"],
             template=self._get_template()
         )
 
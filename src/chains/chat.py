@@ -25,6 +25,7 @@ class ChatChain(BaseChain):
    Action Input: bitcoin
    Observation: Bitcoin 当前价格: $65,432.21 USD
    Final Answer: Bitcoin 当前价格是 $65,432.21 USD
+   多个币种时在一次 Action Input 中全部列出，例如：btc eth sol
 
 3. 技术分析示例：
    Thought: 用户想了解比特币走势，需要进行技术分析
@@ -42,7 +43,7 @@ class ChatChain(BaseChain):
 - 每个回复都必须以 Final Answer 结束
 - 保持思考过程清晰可见
 
-聊天历史：
+{persona}聊天历史：
 {chat_history}
 
 用户输入：{input}
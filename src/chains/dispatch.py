@@ -0,0 +1,136 @@
+"""Gemini 调用的统一调度
+
+所有 LLM 调用在发出前都要从这里取得许可：
+- 令牌桶分别限制每分钟请求数和每分钟 token 数
+- 等待中的调用按优先级排队，@提及优先于随机回复
+- 排队过深时直接丢弃随机回复
+
+经过调度器的 Gemini 模型在 model.py 中，本模块不导入 LangChain 和
+Gemini SDK，机器人启动时只需要这里的调度器和常量。
+"""
+from contextvars import ContextVar
+from typing import Any, List, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from ..bot.config import Config
+from .prompt import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# 调用优先级，数值越小越优先
+PRIORITY_MENTION = 0
+PRIORITY_RANDOM = 1
+
+# 当前调用的优先级，由 BaseChain.run 设置
+llm_priority: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_MENTION)
+
+
+class LLMOverloadedError(Exception):
+    """LLM 队列过深，低优先级请求被丢弃"""
+
+
+class TokenBucket:
+    """按分钟速率补充的令牌桶"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.rate = rate_per_minute / 60
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """获取 amount 个令牌还需等待的秒数"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class LLMDispatcher:
+    """带优先级队列的 LLM 限流器"""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, shed_queue_depth: int = 5):
+        # rpm/tpm 为 0 表示不限制
+        self.request_bucket = TokenBucket(rpm) if rpm > 0 else None
+        self.token_bucket = TokenBucket(tpm) if tpm > 0 else None
+        self.shed_queue_depth = shed_queue_depth
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+        self.shed_count = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """等待中的调用数"""
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    def should_shed(self, priority: int) -> bool:
+        """队列过深时丢弃低优先级请求"""
+        return priority > PRIORITY_MENTION and self.queue_depth >= self.shed_queue_depth
+
+    async def acquire(self, priority: int, tokens: int = 0) -> None:
+        """等待发出一次 LLM 调用的许可，被丢弃时抛出 LLMOverloadedError"""
+        if self.should_shed(priority):
+            self.shed_count += 1
+            raise LLMOverloadedError("LLM queue is full")
+        if self.request_bucket is None and self.token_bucket is None:
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), tokens, future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.wait_time(1))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.wait_time(tokens))
+        return wait
+
+    async def _pump(self) -> None:
+        """按优先级依次放行等待中的调用"""
+        while self._waiters:
+            priority, _, tokens, future = self._waiters[0]
+            if future.done():
+                # 调用方已取消
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._wait_time(tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            heapq.heappop(self._waiters)
+            if self.request_bucket is not None:
+                self.request_bucket.consume(1)
+            if self.token_bucket is not None:
+                self.token_bucket.consume(tokens)
+            future.set_result(None)
+
+
+def estimate_tokens(messages: List[Any]) -> int:
+    """粗略估算消息的 token 数"""
+    return sum(count_tokens(str(message.content)) for message in messages)
+
+
+# 全局调度器
+llm_dispatcher = LLMDispatcher(
+    rpm=float(Config.LLM_RPM),
+    tpm=float(Config.LLM_TPM),
+    shed_queue_depth=int(Config.LLM_SHED_QUEUE_DEPTH),
+)
+
@@ -0,0 +1,22 @@
+"""经过调度器的 Gemini 模型"""
+from typing import AsyncIterator
+from langchain_google_genai import ChatGoogleGenerativeAI
+from ..utils.metrics import llm_seconds, llm_wait_seconds
+from .dispatch import estimate_tokens, llm_dispatcher, llm_priority
+
+
+class DispatchedChatModel(ChatGoogleGenerativeAI):
+    """每次调用前先经过全局调度器的 Gemini 模型"""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        with llm_wait_seconds.time():
+            await llm_dispatcher.acquire(llm_priority.get(), estimate_tokens(messages))
+        with llm_seconds.time(mode="generate"):
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator:
+        with llm_wait_seconds.time():
+            await llm_dispatcher.acquire(llm_priority.get(), estimate_tokens(messages))
+        with llm_seconds.time(mode="stream"):
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
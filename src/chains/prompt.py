@@ -0,0 +1,102 @@
+"""按 token 预算组装提示词中的聊天历史
+
+提示词由两部分组成：
+- 静态部分：说明、工具描述和示例，每次调用完全相同，放在提示词最前面，
+  便于 Gemini 对相同前缀做上下文缓存
+- 动态部分：聊天历史、用户输入和代理草稿
+
+聊天历史从最新的消息往前取，直到用完预算；更早的对话以滚动摘要的
+形式出现（见 summary.py）。预算有剩余时再附上群里最近的其他消息
+（预筛选记录的滚动记录，见 bot/prefilter.py）。
+"""
+from typing import List, Sequence, Tuple
+from ..memory.memory import GroupMemory, Message
+
+# 历史中的角色名称
+ROLE_NAMES = {
+    "human": "用户",
+    "assistant": "助手",
+}
+
+# 群里最近消息的标题
+RECENT_HEADER = "群里最近的消息："
+
+
+def count_tokens(text: str) -> int:
+    """粗略估算 token 数（中文约每字一个 token，英文约每四个字符一个）"""
+    return len(text) // 2 + 1
+
+
+def format_message(message: Message) -> str:
+    return f"{ROLE_NAMES.get(message.role, message.role)}: {message.content}"
+
+
+def take_newest(lines: Sequence[str], available: int) -> Tuple[List[str], int]:
+    """从最新的一行往前取，直到用完预算，返回取到的行（按原顺序）和剩余预算"""
+    taken: List[str] = []
+    for line in reversed(lines):
+        cost = count_tokens(line)
+        if cost > available:
+            break
+        taken.append(line)
+        available -= cost
+    taken.reverse()
+    return taken, available
+
+
+class PromptAssembler:
+    """在 token 预算内渲染群组历史"""
+
+    def __init__(self, budget: int, static_tokens: int = 0, reserve: int = 512):
+        """
+        Args:
+            budget: 单次调用的输入 token 预算
+            static_tokens: 静态部分占用的 token 数
+            reserve: 为代理草稿（工具调用结果等）预留的 token 数
+        """
+        self.budget = budget
+        self.static_tokens = static_tokens
+        self.reserve = reserve
+
+    def history_budget(self, input_text: str) -> int:
+        """本次调用可用于历史的 token 数"""
+        return self.budget - self.static_tokens - self.reserve - count_tokens(input_text)
+
+    def render_history(
+        self,
+        memory: GroupMemory,
+        input_text: str,
+        transcript: Sequence[str] = ()
+    ) -> str:
+        """从最新的消息往前取，超出预算的部分只保留摘要
+
+        Args:
+            memory: 群组记忆
+            input_text: 用户输入
+            transcript: 群里最近的其他消息，预算有剩余时附在历史之后
+        """
+        available = self.history_budget(input_text)
+        lines, available = take_newest(
+            [format_message(message) for message in memory.get_messages()],
+            available,
+        )
+
+        if memory.summary:
+            summary_line = f"（更早的对话摘要：{memory.summary}）"
+            cost = count_tokens(summary_line)
+            if cost <= available:
+                lines.insert(0, summary_line)
+                available -= cost
+
+        if transcript:
+            recent, _ = take_newest(transcript, available - count_tokens(RECENT_HEADER))
+            if recent:
+                lines.append(RECENT_HEADER)
+                lines.extend(recent)
+        return "\n".join(lines)
+
+    def render_transcript(self, transcript: Sequence[str], input_text: str) -> str:
+        """只渲染群里最近的消息（不使用群组记忆的直接回答）"""
+        available = self.history_budget(input_text) - count_tokens(RECENT_HEADER)
+        recent, _ = take_newest(transcript, available)
+        return "\n".join([RECENT_HEADER, *recent]) if recent else ""
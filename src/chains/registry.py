@@ -0,0 +1,35 @@
+from typing import TYPE_CHECKING, Dict, Optional, Type
+import logging
+import threading
+
+if TYPE_CHECKING:
+    from .base import BaseChain
+
+logger = logging.getLogger(__name__)
+
+# 进程内共享的链实例，按链类型索引
+_chains: Dict[type, "BaseChain"] = {}
+
+# 链可能在后台线程中创建（见 ChatBot），多个机器人同时创建时只创建一次
+_lock = threading.Lock()
+
+
+def get_chain(chain_cls: Optional[Type["BaseChain"]] = None) -> "BaseChain":
+    """获取共享的链实例，首次调用时创建；未指定类型时为 ChatChain"""
+    if chain_cls is None:
+        # 延迟导入：导入 LangChain 和 Gemini SDK 需要数秒
+        from .chat import ChatChain
+        chain_cls = ChatChain
+    with _lock:
+        chain = _chains.get(chain_cls)
+        if chain is None:
+            logger.info("Building shared chain: %s", chain_cls.__name__)
+            chain = chain_cls()
+            _chains[chain_cls] = chain
+    return chain
+
+
+def clear_chains() -> None:
+    """清除已创建的链实例"""
+    with _lock:
+        _chains.clear()
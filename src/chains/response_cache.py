@@ -0,0 +1,88 @@
+"""回答缓存
+
+不同群组反复出现相同的问题（"现在比特币多少钱"、"eth 走势怎么样"）。
+明确的价格/分析请求按路由结果（意图、币种、指标、计价货币）缓存，
+不同说法的同一个问题共用一条缓存；普通对话按规范化后的文本缓存。
+缓存时间随意图变化，依赖上下文的回答不缓存。
+"""
+from typing import Hashable, Optional
+import re
+from ..tools.cache import AsyncTTLCache
+from .router import INTENT_ANALYSIS, INTENT_CHAT, INTENT_PRICE, Route
+
+# 各意图的缓存时间（秒），未列出的意图不缓存
+INTENT_TTLS = {
+    INTENT_PRICE: 15,
+    INTENT_ANALYSIS: 600,
+    INTENT_CHAT: 3600,
+}
+
+# 指代前文的说法，出现时回答依赖上下文
+CONTEXT_KEYWORDS = [
+    "他", "她", "它", "这个", "那个", "这些", "那些", "刚才", "刚刚", "上面", "之前",
+    "继续", "还有呢", "然后呢", "你说", "我说", "我的", "我是",
+    "that", "this", "it", "above", "again", "previous", "my",
+]
+
+_MENTION_PATTERN = re.compile(r"@\w+")
+_PUNCTUATION_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+_CONTEXT_PATTERN = re.compile(
+    "|".join(
+        rf"(?<![a-z]){re.escape(word)}(?![a-z])" if word.isascii() else re.escape(word)
+        for word in CONTEXT_KEYWORDS
+    )
+)
+
+
+def normalize(text: str) -> str:
+    """去掉@提及、标点和空白并转为小写"""
+    text = _MENTION_PATTERN.sub(" ", text.lower())
+    return _PUNCTUATION_PATTERN.sub("", text)
+
+
+class ResponseCache:
+    """跨群组共享的回答缓存"""
+
+    def __init__(self, maxsize: int = 1000):
+        self.enabled = maxsize > 0
+        self.cache = AsyncTTLCache(
+            ttl=max(INTENT_TTLS.values()),
+            maxsize=max(maxsize, 1),
+            name="response",
+        )
+
+    def key(self, input_text: str, route: Route, persona: str = "") -> Optional[Hashable]:
+        """计算缓存键，回答不可缓存时返回 None
+
+        工具的回答与机器人无关，所有机器人共用；对话的回答按人设区分。
+        """
+        if not self.enabled or route.intent not in INTENT_TTLS:
+            return None
+        # 合并的多条消息是一段对话，不缓存
+        if "\n" in input_text.strip():
+            return None
+        text = _MENTION_PATTERN.sub(" ", input_text.lower())
+        if _CONTEXT_PATTERN.search(text):
+            return None
+
+        if route.intent == INTENT_CHAT:
+            normalized = normalize(input_text)
+            return (INTENT_CHAT, persona, normalized) if normalized else None
+        # 价格/分析只缓存直接调用工具的请求，经过代理的回答会参考聊天历史
+        if not route.is_direct:
+            return None
+        return (
+            route.intent,
+            tuple(route.crypto_ids),
+            tuple(sorted(route.indicators)),
+            tuple(route.currencies or ["usd"]),
+        )
+
+    def get(self, key: Hashable) -> Optional[str]:
+        return self.cache.get(key)
+
+    def set(self, key: Hashable, intent: str, response: str) -> None:
+        """缓存回答，出错的回答不缓存"""
+        if not response or response.startswith("抱歉"):
+            return
+        self.cache.set(key, response, ttl=INTENT_TTLS[intent])
@@ -0,0 +1,234 @@
+"""意图路由
+
+启动时把币种、指标和意图关键词编译成一个正则表达式，一次扫描即可得到
+消息中的币种和意图。明确的价格/分析请求直接调用工具，不经过 LLM；
+只有含义不明确的输入才交给 ReAct 代理。
+"""
+from typing import Dict, List, Optional, Tuple
+import re
+from ..tools.crypto.coins import coin_index
+from ..tools.crypto.constants import (
+    AMBIGUOUS_COIN_TERMS,
+    CRYPTO_MAP,
+    CRYPTO_ZH_MAP,
+    SUPPORTED_INDICATORS,
+    VS_CURRENCY_MAP,
+)
+
+# 意图
+INTENT_CHAT = "chat"          # 普通对话，直接由 LLM 回答
+INTENT_PRICE = "price"        # 价格查询
+INTENT_ANALYSIS = "analysis"  # 技术分析
+INTENT_AGENT = "agent"        # 与加密货币相关但不明确，交给代理
+
+# 直接调用工具所需的最低置信度
+DIRECT_ROUTE_CONFIDENCE = 0.8
+
+# 没有提到币种的指标查询（恐慌指数、彩虹图）看的是整个市场，
+# 支持的指标都以比特币为准
+MARKET_INDICATOR_ID = "bitcoin"
+
+PRICE_KEYWORDS = [
+    "价格", "币价", "现价", "报价", "多少钱", "几块", "price", "prices",
+]
+
+ANALYSIS_KEYWORDS = [
+    "分析", "走势", "趋势", "技术指标", "指标", "analysis", "analyze", "trend",
+]
+
+# 指定单个指标的写法 -> SUPPORTED_INDICATORS 中的名称
+INDICATOR_KEYWORDS = {
+    "恐慌指数": "fear_greed",
+    "贪婪指数": "fear_greed",
+    "恐慌贪婪指数": "fear_greed",
+    "恐惧贪婪指数": "fear_greed",
+    "彩虹图": "rainbow",
+    "pi周期": "pi_cycle",
+    "矿工": "mining",
+    "算力": "mining",
+    "哈希率": "mining",
+}
+INDICATOR_KEYWORDS.update({
+    name: name for name in SUPPORTED_INDICATORS if name != "all"
+})
+
+# 情绪词，和"指数"一起出现时才表示恐慌贪婪指数（"我很恐慌"是普通对话）
+MOOD_KEYWORDS = ["恐慌", "恐惧", "贪婪", "fear", "greed"]
+INDEX_KEYWORDS = ["指数", "index"]
+
+# 与加密货币相关但不表示具体意图的词
+CRYPTO_KEYWORDS = ["币", "市场", "market", "coin", "crypto"]
+
+# 需要 LLM 判断的主观/开放问题
+OPINION_KEYWORDS = [
+    "应该", "买", "卖", "抄底", "会涨", "会跌", "能涨", "为什么", "建议", "觉得", "预测",
+    "should", "buy", "sell", "why", "predict", "think",
+]
+
+# 不影响意图判断的常见虚词
+FILLER_KEYWORDS = [
+    "的", "了", "呢", "啊", "吗", "吧", "现在", "当前", "目前", "今天", "最新", "多少",
+    "查", "查询", "一下", "看看", "帮我", "请", "怎么样", "如何", "和", "跟",
+    "what", "is", "the", "of", "now", "current", "how", "much", "and", "check",
+]
+
+_MENTION_PATTERN = re.compile(r"@\w+")
+_PUNCTUATION_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+_TICKER_PATTERN = re.compile(r"(?<![a-z0-9])[a-z][a-z0-9\-]*(?![a-z0-9])")
+
+
+class Route:
+    """路由结果"""
+    __slots__ = ("intent", "crypto_ids", "indicators", "currencies", "confidence")
+
+    def __init__(
+        self,
+        intent: str,
+        crypto_ids: Optional[List[str]] = None,
+        indicators: Optional[List[str]] = None,
+        confidence: float = 1.0,
+        currencies: Optional[List[str]] = None
+    ):
+        self.intent = intent
+        self.crypto_ids = crypto_ids or []
+        self.indicators = indicators or []
+        self.currencies = currencies or []
+        self.confidence = confidence
+
+    @property
+    def needs_tools(self) -> bool:
+        return self.intent != INTENT_CHAT
+
+    @property
+    def is_direct(self) -> bool:
+        """是否可以不经过 LLM 直接调用工具"""
+        return (
+            self.intent in (INTENT_PRICE, INTENT_ANALYSIS)
+            and self.confidence >= DIRECT_ROUTE_CONFIDENCE
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Route(intent={self.intent!r}, crypto_ids={self.crypto_ids!r}, "
+            f"indicators={self.indicators!r}, confidence={self.confidence:.2f})"
+        )
+
+
+class IntentRouter:
+    """基于单个编译正则的意图路由器"""
+
+    def __init__(self):
+        # 词 -> (类别, 值)
+        self._terms: Dict[str, Tuple[str, Optional[str]]] = {}
+        for term in FILLER_KEYWORDS:
+            self._terms[term] = ("filler", None)
+        for term in CRYPTO_KEYWORDS:
+            self._terms[term] = ("crypto", None)
+        for term, currency in VS_CURRENCY_MAP.items():
+            self._terms[term] = ("currency", currency)
+        for term in OPINION_KEYWORDS:
+            self._terms[term] = ("opinion", None)
+        for term in PRICE_KEYWORDS:
+            self._terms[term] = ("price", None)
+        for term in ANALYSIS_KEYWORDS:
+            self._terms[term] = ("analysis", None)
+        for term in MOOD_KEYWORDS:
+            self._terms[term] = ("mood", None)
+        for term in INDEX_KEYWORDS:
+            self._terms[term] = ("index", None)
+        for term, indicator in INDICATOR_KEYWORDS.items():
+            self._terms[term] = ("indicator", indicator)
+        for term, crypto_id in {**CRYPTO_ZH_MAP, **CRYPTO_MAP}.items():
+            category = "maybe_coin" if term in AMBIGUOUS_COIN_TERMS else "coin"
+            self._terms[term] = (category, crypto_id)
+        for crypto_id in CRYPTO_MAP.values():
+            self._terms.setdefault(crypto_id, ("coin", crypto_id))
+
+        # 长词优先；英文词要求完整单词匹配，中文词按子串匹配
+        alternatives = []
+        for term in sorted(self._terms, key=len, reverse=True):
+            escaped = re.escape(term)
+            if term.isascii():
+                escaped = rf"(?<![a-z0-9]){escaped}(?![a-z0-9])"
+            alternatives.append(escaped)
+        self._pattern = re.compile("|".join(alternatives))
+
+    def route(self, text: str) -> Route:
+        """分析输入并返回路由结果"""
+        text = _MENTION_PATTERN.sub(" ", text.lower())
+
+        crypto_ids: List[str] = []
+        maybe_coins: List[Tuple[str, str]] = []
+        indicators: List[str] = []
+        currencies: List[str] = []
+        found = set()
+        residual = []
+        last_end = 0
+        for match in self._pattern.finditer(text):
+            residual.append(text[last_end:match.start()])
+            last_end = match.end()
+            category, value = self._terms[match.group()]
+            found.add(category)
+            if category == "coin" and value not in crypto_ids:
+                crypto_ids.append(value)
+            elif category == "maybe_coin":
+                maybe_coins.append((match.group(), value))
+            elif category == "indicator" and value not in indicators:
+                indicators.append(value)
+            elif category == "currency" and value not in currencies:
+                currencies.append(value)
+        residual.append(text[last_end:])
+
+        # "恐慌"、"贪婪"只有和"指数"一起出现时才是指标
+        if {"mood", "index"} <= found and "fear_greed" not in indicators:
+            found.add("indicator")
+            indicators.append("fear_greed")
+
+        # 同时是常用词的币种写法（link、雪崩）只在价格/分析请求中算作币种，否则当作普通文字
+        wants_tool = bool(found & {"price", "analysis", "indicator"})
+        for term, crypto_id in maybe_coins:
+            if not wants_tool:
+                residual.append(term)
+            elif crypto_id not in crypto_ids:
+                found.add("coin")
+                crypto_ids.append(crypto_id)
+
+        # 价格/分析请求中没有内置币种时，在币种索引中查找剩余的英文词（如 pepe、arb）
+        if not crypto_ids and wants_tool:
+            def resolve_ticker(match):
+                crypto_id = coin_index.lookup(match.group(), ranked_only=True)
+                if crypto_id is None:
+                    return match.group()
+                found.add("coin")
+                if crypto_id not in crypto_ids:
+                    crypto_ids.append(crypto_id)
+                return " "
+            residual = [_TICKER_PATTERN.sub(resolve_ticker, piece) for piece in residual]
+
+        is_crypto = bool(found & {"coin", "crypto", "price", "analysis", "indicator"})
+        if not is_crypto:
+            return Route(INTENT_CHAT)
+
+        # 去掉已识别的词和标点后，剩余内容越多越不确定
+        leftover = len(_PUNCTUATION_PATTERN.sub("", "".join(residual)))
+        confidence = 0.95 if leftover == 0 else max(0.5, 0.95 - 0.05 * leftover)
+
+        wants_price = "price" in found
+        wants_analysis = bool(found & {"analysis", "indicator"})
+
+        if "opinion" in found or (wants_price and wants_analysis):
+            return Route(INTENT_AGENT, crypto_ids, indicators, min(confidence, 0.4))
+        if not crypto_ids:
+            # 没有币种的指标查询（"恐慌指数"）直接查看整个市场
+            if indicators:
+                return Route(INTENT_ANALYSIS, [MARKET_INDICATOR_ID], indicators, confidence)
+            return Route(INTENT_AGENT, crypto_ids, indicators, min(confidence, 0.4))
+        if wants_price:
+            return Route(INTENT_PRICE, crypto_ids, confidence=confidence, currencies=currencies)
+        if wants_analysis:
+            # 多个币种的分析交给代理
+            if len(crypto_ids) > 1:
+                confidence = min(confidence, 0.5)
+            return Route(INTENT_ANALYSIS, crypto_ids, indicators, confidence)
+        # 只提到币种，没有明确意图
+        return Route(INTENT_AGENT, crypto_ids, indicators, min(confidence, 0.6))
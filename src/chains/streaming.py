@@ -0,0 +1,32 @@
+"""流式输出支持"""
+from typing import Any, Awaitable, Callable
+from langchain.callbacks.base import AsyncCallbackHandler
+
+# 接收当前已生成文本的回调
+PartialCallback = Callable[[str], Awaitable[None]]
+
+
+class FinalAnswerStreamHandler(AsyncCallbackHandler):
+    """只转发 ReAct 输出中 Final Answer 之后的内容"""
+
+    marker = "Final Answer:"
+
+    def __init__(self, on_partial: PartialCallback):
+        self.on_partial = on_partial
+        self._buffer = ""
+
+    async def on_chat_model_start(self, serialized: Any, messages: Any, **kwargs: Any) -> None:
+        # 每次 LLM 调用重新开始
+        self._buffer = ""
+
+    async def on_llm_start(self, serialized: Any, prompts: Any, **kwargs: Any) -> None:
+        self._buffer = ""
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self._buffer += token
+        index = self._buffer.find(self.marker)
+        if index < 0:
+            return
+        answer = self._buffer[index + len(self.marker):].strip()
+        if answer:
+            await self.on_partial(answer)
@@ -0,0 +1,88 @@
+"""群组历史的滚动摘要
+
+移出记忆缓冲区的旧消息积累到一定数量后，由后台任务调用 LLM 合并进
+群组摘要。摘要请求以低优先级经过调度器，LLM 繁忙时被丢弃，消息放回
+等待下次合并，不会阻塞回复。
+"""
+from typing import Dict, Optional
+import asyncio
+import logging
+from langchain_core.language_models import BaseChatModel
+from ..memory.memory import GroupMemory
+from .dispatch import LLMOverloadedError, PRIORITY_RANDOM, llm_priority
+from .prompt import count_tokens, format_message
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """请把新的群聊记录合并进已有摘要，生成新的摘要。
+只保留对后续对话有用的信息（讨论的话题、提到的币种、用户的问题和结论），不超过 {max_chars} 字。
+
+已有摘要：
+{summary}
+
+新的聊天记录：
+{messages}
+
+新的摘要："""
+
+
+class HistorySummarizer:
+    """在后台更新群组摘要"""
+
+    def __init__(self, llm: BaseChatModel, batch_size: int = 6, max_tokens: int = 200):
+        """
+        Args:
+            llm: 生成摘要的模型
+            batch_size: 积累多少条移出的消息后更新一次摘要
+            max_tokens: 摘要的 token 上限
+        """
+        self.llm = llm
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self._running: Dict[int, asyncio.Task] = {}
+
+    def maybe_schedule(self, memory: GroupMemory) -> None:
+        """移出的消息足够多时在后台更新摘要"""
+        if memory.overflow_count < self.batch_size or memory.chat_id in self._running:
+            return
+        task = asyncio.create_task(self._summarize(memory))
+        self._running[memory.chat_id] = task
+        task.add_done_callback(lambda _: self._running.pop(memory.chat_id, None))
+
+    def running(self, chat_id: int) -> Optional[asyncio.Task]:
+        """群组正在进行的摘要任务"""
+        return self._running.get(chat_id)
+
+    async def _summarize(self, memory: GroupMemory) -> None:
+        messages = memory.take_overflow()
+        prompt = SUMMARY_PROMPT.format(
+            max_chars=self.max_tokens,
+            summary=memory.summary or "（无）",
+            messages="\n".join(format_message(message) for message in messages),
+        )
+        token = llm_priority.set(PRIORITY_RANDOM)
+        try:
+            result = await self.llm.ainvoke(prompt)
+        except LLMOverloadedError:
+            memory.restore_overflow(messages)
+            return
+        except Exception as e:
+            logger.warning("Failed to summarize history of group %s: %s", memory.chat_id, e)
+            memory.restore_overflow(messages)
+            return
+        finally:
+            llm_priority.reset(token)
+
+        summary = str(result.content).strip()
+        # 超出上限时截断（token 估算约每两个字符一个）
+        if count_tokens(summary) > self.max_tokens:
+            summary = summary[:self.max_tokens * 2]
+        memory.summary = summary
+        logger.debug("Updated summary of group %s", memory.chat_id)
+
+    async def close(self) -> None:
+        """取消未完成的摘要任务"""
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
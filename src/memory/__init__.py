@@ -1,3 +1,4 @@
-from .conversation import GroupMemory
+from .memory import GroupMemory, Message
+from .store import GroupMemoryStore, SQLiteMemoryBackend
 
-__all__ = ['GroupMemory'] 
\ No newline at end of file
+__all__ = ['GroupMemory', 'Message', 'GroupMemoryStore', 'SQLiteMemoryBackend']
\ No newline at end of file
@@ -1,53 +1,224 @@
-from pydantic import BaseModel
-from langchain.memory import ConversationBufferMemory
-from typing import Dict, List, Optional
-
-class Message(BaseModel):
-    """消息模型"""
-    role: str
-    content: str
-
-class GroupMemory(BaseModel):
-    """群组记忆类"""
-    chat_id: int  # 改用 chat_id 而不是 group_id
-    messages: List[Message] = []
-    max_messages: int = 10
-    memory: Optional[ConversationBufferMemory] = None
-
-    def __init__(self, chat_id: int, **data):
-        super().__init__(chat_id=chat_id, **data)
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
-
-    def add_message(self, role: str, content: str):
-        """添加新消息"""
-        # 添加新消息
-        self.messages.append(Message(role=role, content=content))
-        
-        # 如果超过最大消息数，删除最旧的消息
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages:]
-        
-        # 更新 LangChain 记忆
-        if role == "human":
-            self.memory.save_context(
-                {"input": content}, 
-                {"output": ""}
-            )
-        elif role == "assistant":
-            # 更新最后一条记录的输出
-            history = self.memory.load_memory_variables({})
-            if history and "chat_history" in history:
-                last_interaction = history["chat_history"][-1]
-                last_interaction.output = content
+from collections import deque
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Set
+import time
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
+
+# 情绪记录的保留条数
+MAX_EMOTIONS = 50
+
+# 移出缓冲区、等待合并进摘要的消息数上限
+MAX_OVERFLOW = 40
+
+class Message:
+    """消息记录"""
+    __slots__ = ("role", "content", "user_id", "timestamp")
+
+    def __init__(
+        self,
+        role: str,
+        content: str,
+        user_id: Optional[int] = None,
+        timestamp: Optional[float] = None
+    ):
+        self.role = role
+        self.content = content
+        self.user_id = user_id
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def to_dict(self) -> dict:
+        return {
+            "role": self.role,
+            "content": self.content,
+            "user_id": self.user_id,
+            "timestamp": self.timestamp,
+        }
+
+    def to_langchain(self) -> "BaseMessage":
+        """转换为 LangChain 消息"""
+        # 延迟导入：群组记忆在启动时创建，LangChain 只在构建提示词时才需要
+        from langchain.schema import AIMessage, HumanMessage
+        if self.role == "human":
+            return HumanMessage(content=self.content)
+        return AIMessage(content=self.content)
+
+class GroupMemory:
+    """群组记忆类
+
+    最近的消息保存在定长环形缓冲区中，只在构建提示词时才转换为
+    LangChain 消息。对外提供与 LangChain 记忆相同的
+    load_memory_variables/save_context 接口。
+
+    移出缓冲区的旧消息暂存在 overflow 中，由后台任务合并进 summary。
+    """
+    __slots__ = (
+        "chat_id",
+        "max_messages",
+        "summary",
+        "_messages",
+        "_overflow",
+        "_rendered",
+        "_emotions",
+        "_message_count",
+        "_active_users",
+        "_last_activity",
+    )
+
+    memory_key = "chat_history"
+
+    def __init__(self, chat_id: int, max_messages: int = 10):
+        self.chat_id = chat_id
+        self.max_messages = max_messages
+        self._messages: Deque[Message] = deque(maxlen=max_messages)
+        # 更早对话的滚动摘要
+        self.summary = ""
+        self._overflow: Deque[Message] = deque(maxlen=MAX_OVERFLOW)
+        # 缓存转换后的 LangChain 消息，消息变化时失效
+        self._rendered: Optional[List["BaseMessage"]] = None
+        self._emotions: Deque[tuple] = deque(maxlen=MAX_EMOTIONS)
+        self._message_count = 0
+        self._active_users: Set[int] = set()
+        self._last_activity: Optional[datetime] = None
+
+    @property
+    def group_id(self) -> int:
+        return self.chat_id
+
+    @property
+    def stats(self) -> dict:
+        """获取群组统计信息"""
+        return {
+            "group_id": self.chat_id,
+            "message_count": self._message_count,
+            "active_users_count": len(self._active_users),
+            "last_activity": self._last_activity,
+            "emotions_count": len(self._emotions)
+        }
+
+    def add_message(self, role: str, content: str, user_id: Optional[int] = None):
+        """添加新消息，超过 max_messages 时最旧的消息移入 overflow 等待摘要"""
+        if len(self._messages) == self.max_messages:
+            self._overflow.append(self._messages[0])
+        self._messages.append(Message(role, content, user_id))
+        self._rendered = None
+        self._message_count += 1
+        self._last_activity = datetime.now()
+        if user_id is not None:
+            self._active_users.add(user_id)
 
     def get_messages(self) -> List[Message]:
         """获取所有消息"""
-        return self.messages
+        return list(self._messages)
+
+    @property
+    def overflow_count(self) -> int:
+        """等待合并进摘要的消息数"""
+        return len(self._overflow)
+
+    def take_overflow(self) -> List[Message]:
+        """取出等待摘要的消息"""
+        messages = list(self._overflow)
+        self._overflow.clear()
+        return messages
+
+    def restore_overflow(self, messages: List[Message]) -> None:
+        """摘要失败时放回取出的消息（放在之后新移出的消息前面）"""
+        pending = list(self._overflow)
+        self._overflow.clear()
+        self._overflow.extend(messages + pending)
+
+    def get_chat_history(self) -> List["BaseMessage"]:
+        """获取 LangChain 格式的聊天历史"""
+        if self._rendered is None:
+            self._rendered = [message.to_langchain() for message in self._messages]
+        return self._rendered
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """返回提示词使用的记忆变量"""
+        return {self.memory_key: self.get_chat_history()}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, Any]) -> None:
+        """保存一轮对话"""
+        self.add_message("human", inputs["input"], inputs.get("user_id"))
+        self.add_message("assistant", outputs["output"])
+
+    def add_emotion(self, emotion: str, timestamp: Optional[datetime] = None) -> None:
+        """添加情绪记录"""
+        self._emotions.append((emotion, timestamp or datetime.now()))
+
+    def get_emotions(self) -> List[Dict]:
+        """获取情绪历史"""
+        return [
+            {"emotion": emotion, "timestamp": timestamp}
+            for emotion, timestamp in self._emotions
+        ]
+
+    def get_active_users(self) -> Set[int]:
+        """获取活跃用户集合"""
+        return self._active_users.copy()
 
     def clear(self):
-        """清空记忆"""
-        self.messages = []
-        self.memory.clear() 
\ No newline at end of file
+        """清空记忆和统计信息"""
+        self._messages.clear()
+        self._overflow.clear()
+        self.summary = ""
+        self._rendered = None
+        self._emotions.clear()
+        self._message_count = 0
+        self._active_users = set()
+        self._last_activity = None
+
+    def to_dict(self) -> dict:
+        """将记忆转换为可 JSON 序列化的字典"""
+        return {
+            "chat_id": self.chat_id,
+            "max_messages": self.max_messages,
+            "messages": [message.to_dict() for message in self._messages],
+            "summary": self.summary,
+            "overflow": [message.to_dict() for message in self._overflow],
+            "stats": {
+                "emotions": [
+                    {"emotion": emotion, "timestamp": timestamp.isoformat()}
+                    for emotion, timestamp in self._emotions
+                ],
+                "message_count": self._message_count,
+                "active_users": list(self._active_users),
+                "last_activity": (
+                    self._last_activity.isoformat() if self._last_activity else None
+                ),
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, max_messages: Optional[int] = None) -> "GroupMemory":
+        """从字典格式恢复记忆
+
+        Args:
+            data: to_dict() 的结果
+            max_messages: 当前的消息条数上限，为空时使用保存时的上限；
+                超出上限的较早消息移入 overflow 等待摘要
+        """
+        if max_messages is None:
+            max_messages = data.get("max_messages", 10)
+        instance = cls(data["chat_id"], max_messages=max_messages)
+        instance.summary = data.get("summary", "")
+        messages = [Message(**message) for message in data.get("messages", [])]
+        kept = len(messages) - max_messages
+        # overflow 有长度上限，最早的消息会被丢弃
+        for message in data.get("overflow", []):
+            instance._overflow.append(Message(**message))
+        instance._overflow.extend(messages[:max(kept, 0)])
+        instance._messages.extend(messages[max(kept, 0):])
+
+        stats = data.get("stats", {})
+        for emotion in stats.get("emotions", []):
+            instance._emotions.append(
+                (emotion["emotion"], datetime.fromisoformat(emotion["timestamp"]))
+            )
+        instance._message_count = stats.get("message_count", len(instance._messages))
+        instance._active_users = set(stats.get("active_users", []))
+        if stats.get("last_activity"):
+            instance._last_activity = datetime.fromisoformat(stats["last_activity"])
+        return instance
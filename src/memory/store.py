@@ -0,0 +1,235 @@
+"""群组记忆存储
+
+内存中最多保留 max_groups 个群组，按最近访问时间（LRU）和空闲时间淘汰，
+正在使用的群组（pin）不会被淘汰。被淘汰的群组写入本地 SQLite（后台线程
+写入），下次访问时在线程池中加载。
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from .memory import GroupMemory
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteMemoryBackend:
+    """基于 SQLite 的群组记忆持久化
+
+    写入在后台线程中进行（write-behind）：save/delete 只记录每个群组的
+    最新数据，写线程把积累的改动放在一个事务里提交，事件循环不等待磁盘
+    和 WAL 锁。读取时先查还没写入的改动，load 可以在线程池中调用。
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 读取共用一个连接（可能来自线程池的不同线程，用锁串行），写入使用写线程自己的连接
+        self._conn = self._connect(check_same_thread=False)
+        self._read_lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS group_memory ("
+            "chat_id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        # chat_id -> 待写入的数据（None 表示删除）；_writing 为写线程正在提交的一批
+        self._pending: Dict[int, Optional[dict]] = {}
+        self._writing: Dict[int, Optional[dict]] = {}
+        self._cond = threading.Condition()
+        self._closing = False
+        self._writer = threading.Thread(target=self._write_loop, name="memory-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self, chat_id: int) -> Optional[dict]:
+        """读取群组记忆"""
+        with self._cond:
+            for changes in (self._pending, self._writing):
+                if chat_id in changes:
+                    return changes[chat_id]
+        with self._read_lock:
+            row = self._conn.execute(
+                "SELECT data FROM group_memory WHERE chat_id = ?", (chat_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, chat_id: int, data: dict) -> None:
+        """写入群组记忆（在后台提交）"""
+        self._submit(chat_id, data)
+
+    def delete(self, chat_id: int) -> None:
+        """删除群组记忆（在后台提交）"""
+        self._submit(chat_id, None)
+
+    def _submit(self, chat_id: int, data: Optional[dict]) -> None:
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Memory backend is closed")
+            self._pending[chat_id] = data
+            self._cond.notify()
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                with self._cond:
+                    while not self._pending and not self._closing:
+                        self._cond.wait()
+                    if not self._pending:
+                        return
+                    self._writing, self._pending = self._pending, {}
+                try:
+                    self._write(conn, self._writing)
+                except Exception as e:
+                    logger.error("Failed to persist memory for %s groups: %s", len(self._writing), e)
+                with self._cond:
+                    self._writing = {}
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, changes: Dict[int, Optional[dict]]) -> None:
+        now = time.time()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO group_memory (chat_id, data, updated_at) VALUES (?, ?, ?)",
+                [
+                    (chat_id, json.dumps(data, ensure_ascii=False), now)
+                    for chat_id, data in changes.items() if data is not None
+                ]
+            )
+            conn.executemany(
+                "DELETE FROM group_memory WHERE chat_id = ?",
+                [(chat_id,) for chat_id, data in changes.items() if data is None]
+            )
+
+    def close(self) -> None:
+        """写完剩余的改动后关闭"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._writer.join()
+        with self._read_lock:
+            self._conn.close()
+
+
+class GroupMemoryStore:
+    """有容量上限、可淘汰的群组记忆存储
+
+    只在事件循环中使用。回复或后台摘要期间用 pin/release 固定群组记忆，
+    固定的群组不会被淘汰，避免淘汰后写入磁盘的是旧数据、之后的改动丢失。
+    """
+
+    def __init__(
+        self,
+        max_groups: int = 1000,
+        idle_ttl: float = 3600,
+        max_messages: int = 10,
+        backend: Optional[SQLiteMemoryBackend] = None,
+    ):
+        self.max_groups = max_groups
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.backend = backend
+        # chat_id -> (GroupMemory, 最后访问时间)，按访问顺序排列
+        self._groups: "OrderedDict[int, tuple]" = OrderedDict()
+        # chat_id -> 固定次数
+        self._pins: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._groups
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._groups)
+
+    async def get(self, chat_id: int) -> GroupMemory:
+        """获取群组记忆，不在内存中时从持久化存储加载（线程池中）或新建"""
+        item = self._groups.get(chat_id)
+        if item is None:
+            memory = await self._load(chat_id)
+            # 加载期间其他协程可能已经放入了同一个群组
+            item = self._groups.get(chat_id)
+        if item is not None:
+            memory = item[0]
+        now = time.monotonic()
+        self._groups[chat_id] = (memory, now)
+        self._groups.move_to_end(chat_id)
+        self._evict(now)
+        return memory
+
+    def pin(self, chat_id: int) -> None:
+        """固定内存中的群组记忆，release 之前不会被淘汰"""
+        if chat_id not in self._groups:
+            raise KeyError(chat_id)
+        self._pins[chat_id] = self._pins.get(chat_id, 0) + 1
+
+    def release(self, chat_id: int) -> None:
+        """取消一次固定，不再固定后按容量和空闲时间重新检查淘汰"""
+        count = self._pins.get(chat_id, 0) - 1
+        if count > 0:
+            self._pins[chat_id] = count
+            return
+        self._pins.pop(chat_id, None)
+        self._evict(time.monotonic())
+
+    async def _load(self, chat_id: int) -> GroupMemory:
+        if self.backend is not None:
+            try:
+                loop = asyncio.get_running_loop()
+                data = await loop.run_in_executor(None, self.backend.load, chat_id)
+                if data is not None:
+                    return GroupMemory.from_dict(data, max_messages=self.max_messages)
+            except Exception as e:
+                logger.error("Failed to load memory for group %s: %s", chat_id, e)
+        return GroupMemory(chat_id, max_messages=self.max_messages)
+
+    def _evict(self, now: float) -> None:
+        """淘汰超出容量或空闲过久的群组（最久未访问的在最前）
+
+        跳过固定的群组和刚访问的群组，固定的群组较多时可以暂时超出容量。
+        """
+        for chat_id, (memory, last_access) in list(self._groups.items())[:-1]:
+            over_capacity = len(self._groups) > self.max_groups
+            idle = self.idle_ttl > 0 and now - last_access > self.idle_ttl
+            if not (over_capacity or idle):
+                break
+            if chat_id in self._pins:
+                continue
+            del self._groups[chat_id]
+            self._spill(chat_id, memory)
+
+    def _spill(self, chat_id: int, memory: GroupMemory) -> None:
+        """将群组记忆写入持久化存储"""
+        if self.backend is None:
+            return
+        try:
+            self.backend.save(chat_id, memory.to_dict())
+        except Exception as e:
+            logger.error("Failed to persist memory for group %s: %s", chat_id, e)
+
+    def flush(self) -> None:
+        """将内存中的所有群组写入持久化存储"""
+        for chat_id, (memory, _) in self._groups.items():
+            self._spill(chat_id, memory)
+
+    def close(self) -> None:
+        """写入所有群组并关闭持久化存储"""
+        self.flush()
+        # 之后才结束的摘要任务释放固定时不再淘汰和写入
+        self._groups.clear()
+        self._pins.clear()
+        if self.backend is not None:
+            self.backend.close()
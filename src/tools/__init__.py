@@ -1,4 +1,19 @@
-from .crypto.price import CryptoPriceTool
-from .crypto.analysis import CryptoAnalysisTool
+"""工具
 
-__all__ = ['CryptoPriceTool', 'CryptoAnalysisTool'] 
\ No newline at end of file
+工具类依赖 LangChain，在首次访问时才导入，导入 tools.http、
+tools.crypto.coins 等轻量模块时不会加载 LangChain。
+"""
+from importlib import import_module
+
+_EXPORTS = {
+    'CryptoPriceTool': '.crypto.price',
+    'CryptoAnalysisTool': '.crypto.analysis',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_EXPORTS[name], __name__), name)
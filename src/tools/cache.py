@@ -0,0 +1,151 @@
+"""工具使用的异步 TTL 缓存
+
+- 过期时间内直接命中
+- 过期但仍在 stale 窗口内时先返回旧值，同时在后台刷新（stale-while-revalidate）
+- 同一个键的并发未命中只发起一次上游请求（single-flight）
+- 按 LRU 淘汰，条目数有上限
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import asyncio
+import logging
+import time
+from ..utils.metrics import cache_requests
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    """缓存条目"""
+    __slots__ = ("value", "expires_at", "stale_until")
+
+    def __init__(self, value: Any, expires_at: float, stale_until: float):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class AsyncTTLCache:
+    """带请求合并的异步 TTL 缓存
+
+    fetch 返回 None 或抛出异常时不写入缓存；异常会传递给所有
+    等待同一次请求的调用方。
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        stale_ttl: float = 0,
+        maxsize: int = 256,
+        name: str = "cache",
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.name = name
+        self._data: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        # 统计计数
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def stats(self) -> dict:
+        """获取缓存统计信息"""
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+        }
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取未过期的缓存值，不触发上游请求（与 get_or_fetch 一样更新 LRU 顺序和命中统计）"""
+        entry = self._data.get(key)
+        if entry is None or time.monotonic() >= entry.expires_at:
+            self.misses += 1
+            cache_requests.inc(cache=self.name, result="miss")
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        cache_requests.inc(cache=self.name, result="hit")
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存值，ttl 为空时使用默认过期时间"""
+        now = time.monotonic()
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = _Entry(value, now + ttl, now + ttl + self.stale_ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """删除指定键"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._data.clear()
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """读取缓存，未命中时调用 fetch 获取并写入"""
+        now = time.monotonic()
+        entry = self._data.get(key)
+        if entry is not None:
+            if now < entry.expires_at:
+                self._data.move_to_end(key)
+                self.hits += 1
+                cache_requests.inc(cache=self.name, result="hit")
+                return entry.value
+            if now < entry.stale_until:
+                # 返回旧值，后台刷新
+                self._data.move_to_end(key)
+                self.stale_hits += 1
+                cache_requests.inc(cache=self.name, result="stale")
+                if key not in self._inflight:
+                    self._start_fetch(key, fetch)
+                return entry.value
+            del self._data[key]
+
+        future = self._inflight.get(key)
+        if future is None:
+            self.misses += 1
+            cache_requests.inc(cache=self.name, result="miss")
+            future = self._start_fetch(key, fetch)
+        else:
+            self.coalesced += 1
+            cache_requests.inc(cache=self.name, result="coalesced")
+        # shield: 某个调用方被取消时不影响共享的请求
+        return await asyncio.shield(future)
+
+    def _start_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """发起一次共享的上游请求"""
+        task = asyncio.ensure_future(self._fetch(key, fetch))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._on_fetch_done(key, t))
+        return task
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def _on_fetch_done(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 读取异常，避免后台刷新失败时出现未处理异常警告
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Cache %s fetch failed for %r: %s", self.name, key, task.exception())
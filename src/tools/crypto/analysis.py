@@ -1,9 +1,138 @@
-from typing import Optional, Type, List, Union
+from typing import Awaitable, Optional, Tuple, Type, List, Union
 from langchain.tools import BaseTool
 from langchain.pydantic_v1 import BaseModel, Field
 import aiohttp
-from datetime import datetime, timedelta
-from .constants import CRYPTO_MAP, SUPPORTED_INDICATORS, FULL_ANALYSIS_SUPPORTED
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+import numpy as np
+from . import indicators as btc_indicators
+from .archive import price_archive
+from .coins import coin_index
+from .constants import SUPPORTED_INDICATORS, FULL_ANALYSIS_SUPPORTED
+from .snapshot import market_snapshot
+from ..cache import AsyncTTLCache
+from ..http import get_session
+from ..result import ToolResult
+from ...utils.metrics import http_rate_limited, tool_seconds
+
+logger = logging.getLogger(__name__)
+
+# 数据源地址
+ALTERNATIVE_ME_API_URL = "https://api.alternative.me"
+BLOCKCHAIN_API_URL = "https://api.blockchain.info"
+
+# 按天对齐的序列：(天序号, 数值)
+DailySeries = Tuple[np.ndarray, np.ndarray]
+
+# 指标缓存：恐慌指数和历史序列最多每小时变化一次
+indicator_cache = AsyncTTLCache(ttl=3600, stale_ttl=6 * 3600, maxsize=64, name="indicator")
+
+# 单个指标的超时时间（秒），超时的指标不出现在报告中
+DEFAULT_INDICATOR_TIMEOUT = 8
+INDICATOR_TIMEOUTS = {
+    "fear_greed": 5,
+    "rainbow": 8,
+}
+
+async def fetch_fear_greed_value(session: aiohttp.ClientSession) -> Optional[int]:
+    """请求 alternative.me 恐慌贪婪指数"""
+    try:
+        url = f"{ALTERNATIVE_ME_API_URL}/fng/"
+        async with session.get(url) as response:
+            if response.status == 429:
+                http_rate_limited.inc(api="alternative.me")
+            if response.status == 200:
+                data = await response.json()
+                return int(data['data'][0]['value'])
+    except Exception as e:
+        logger.error("Error getting fear & greed index: %s", e)
+    return None
+
+async def fetch_chart(
+    session: aiohttp.ClientSession,
+    chart: str,
+    timespan: str = "all"
+) -> Optional[List[dict]]:
+    """请求 blockchain.info 图表序列（如 market-price、mvrv），每项为 {"x": 时间戳, "y": 数值}"""
+    try:
+        url = f"{BLOCKCHAIN_API_URL}/charts/{chart}"
+        params = {
+            "timespan": timespan,
+            "sampled": "false",
+            "format": "json"
+        }
+        async with session.get(url, params=params) as response:
+            if response.status == 429:
+                http_rate_limited.inc(api="blockchain.info")
+            if response.status == 200:
+                data = await response.json()
+                return data['values'] or None
+    except Exception as e:
+        logger.error("Error getting %s chart: %s", chart, e)
+    return None
+
+async def fetch_daily_series(
+    session: aiohttp.ClientSession,
+    chart: str = "market-price"
+) -> Optional[DailySeries]:
+    """请求完整的图表序列并按天对齐"""
+    values = await fetch_chart(session, chart)
+    if not values:
+        return None
+    return btc_indicators.daily_series(
+        [point['x'] for point in values],
+        [point['y'] for point in values],
+    )
+
+async def sync_archive(session: aiohttp.ClientSession, chart: str) -> Optional[int]:
+    """只请求归档中最后一个点之后的数据并追加，返回追加的天数"""
+    last = price_archive.last_timestamp(chart)
+    if last is None:
+        timespan = "all"
+    else:
+        timespan = f"{(int(time.time()) - last) // btc_indicators.DAY + 2}days"
+    values = await fetch_chart(session, chart, timespan)
+    if not values:
+        return None
+    days, series = btc_indicators.daily_series(
+        [point['x'] for point in values],
+        [point['y'] for point in values],
+    )
+    added = price_archive.append(chart, days * btc_indicators.DAY, series)
+    return added
+
+async def load_daily_series(
+    session: aiohttp.ClientSession,
+    chart: str = "market-price",
+    refresh: bool = False
+) -> Optional[DailySeries]:
+    """获取按天对齐的序列
+
+    启用本地归档时从归档读取，缺少昨天之后的数据时才增量同步；
+    未启用时请求完整序列并缓存，refresh 为 True 时跳过缓存。
+    """
+    if not price_archive.enabled:
+        if refresh:
+            return await fetch_daily_series(session, chart)
+        return await indicator_cache.get_or_fetch(
+            ("series", chart),
+            lambda: fetch_daily_series(session, chart)
+        )
+
+    last = price_archive.last_timestamp(chart)
+    yesterday = (int(time.time()) // btc_indicators.DAY - 1) * btc_indicators.DAY
+    if last is None or last < yesterday:
+        # 合并并发的同步；上游尚未更新时最多每小时重试一次
+        await indicator_cache.get_or_fetch(
+            ("sync", chart),
+            lambda: sync_archive(session, chart)
+        )
+    timestamps, values = price_archive.series(chart)
+    if len(timestamps) == 0:
+        return None
+    return timestamps // btc_indicators.DAY, values
 
 class CryptoAnalysisInput(BaseModel):
     """加密货币技术分析的输入参数"""
@@ -31,6 +160,11 @@ class CryptoAnalysisTool(BaseTool):
 
     async def _arun(self, crypto_id: Union[str, dict], indicators: List[str] = ["all"]) -> str:
         """分析加密货币的技术指标"""
+        return (await self.query(crypto_id, indicators)).text
+
+    @tool_seconds.time(tool="crypto_analysis")
+    async def query(self, crypto_id: Union[str, dict], indicators: List[str] = ["all"]) -> ToolResult:
+        """分析加密货币的技术指标，有指标获取失败时结果标记为不完整"""
         # 处理输入格式
         if isinstance(crypto_id, dict):
             crypto_id = str(crypto_id).strip('{}').strip()
@@ -39,113 +173,177 @@ class CryptoAnalysisTool(BaseTool):
 
         # 标准化输入
         crypto_id = crypto_id.lower()
-        crypto_id = CRYPTO_MAP.get(crypto_id, crypto_id)
+        crypto_id = coin_index.resolve(crypto_id) or crypto_id
 
         # 检查是否支持完整分析
         if crypto_id not in FULL_ANALYSIS_SUPPORTED and "all" in indicators:
-            print(f"警告：{crypto_id} 不支持所有指标，只支持恐惧贪婪指数")
+            logger.warning("%s 不支持所有指标，只支持恐惧贪婪指数", crypto_id)
             indicators = ["fear_greed"]
 
-        analysis_results = []
-        
-        async with aiohttp.ClientSession() as session:
-            # 获取恐慌指数
-            if "all" in indicators or "fear_greed" in indicators:
-                fear_greed = await self._get_fear_greed_index(session)
-                if fear_greed:
-                    analysis_results.append(fear_greed)
-
-            if crypto_id in FULL_ANALYSIS_SUPPORTED:
-                # 比特币特有指标
-                if "all" in indicators or "rainbow" in indicators:
-                    rainbow = await self._get_rainbow_chart(session)
-                    if rainbow:
-                        analysis_results.append(rainbow)
-
-                if "all" in indicators or "s2f" in indicators:
-                    s2f = await self._get_stock_to_flow(session)
-                    if s2f:
-                        analysis_results.append(s2f)
-
-                if "all" in indicators or "mvrv" in indicators:
-                    mvrv = await self._get_mvrv_zscore(session)
-                    if mvrv:
-                        analysis_results.append(mvrv)
-
-                if "all" in indicators or "mining" in indicators:
-                    mining = await self._get_mining_analysis(session)
-                    if mining:
-                        analysis_results.append(mining)
+        # 按固定顺序收集要计算的指标
+        session = get_session()
+        tasks = []
+        if "all" in indicators or "fear_greed" in indicators:
+            tasks.append(("fear_greed", self._get_fear_greed_index(session)))
 
-        if not analysis_results:
-            return f"抱歉，无法获取 {crypto_id} 的技术分析数据。"
+        if crypto_id in FULL_ANALYSIS_SUPPORTED:
+            # 比特币特有指标
+            if "all" in indicators or "rainbow" in indicators:
+                tasks.append(("rainbow", self._get_rainbow_chart(session)))
+            if "all" in indicators or "s2f" in indicators:
+                tasks.append(("s2f", self._get_stock_to_flow(session)))
+            if "all" in indicators or "pi_cycle" in indicators:
+                tasks.append(("pi_cycle", self._get_pi_cycle(session)))
+            if "all" in indicators or "mvrv" in indicators:
+                tasks.append(("mvrv", self._get_mvrv_zscore(session)))
+            if "all" in indicators or "mining" in indicators:
+                tasks.append(("mining", self._get_mining_analysis(session)))
 
-        return "\n\n".join([
-            f"📊 {crypto_id.upper()} 技术分析报告",
-            *analysis_results
+        # 并发获取，结果保持原有顺序
+        results = await asyncio.gather(*[
+            self._with_timeout(name, coro) for name, coro in tasks
         ])
+        analysis_results = [result for result in results if result]
 
-    async def _get_fear_greed_index(self, session: aiohttp.ClientSession) -> Optional[str]:
-        """获取恐慧指数"""
+        if not analysis_results:
+            return ToolResult(f"抱歉，无法获取 {crypto_id} 的技术分析数据。", complete=False)
+
+        return ToolResult(
+            "\n\n".join([
+                f"📊 {crypto_id.upper()} 技术分析报告",
+                *analysis_results
+            ]),
+            complete=len(analysis_results) == len(tasks)
+        )
+
+    async def _with_timeout(self, name: str, coro: Awaitable[Optional[str]]) -> Optional[str]:
+        """在指标各自的超时时间内等待结果，超时或失败时返回 None"""
+        timeout = INDICATOR_TIMEOUTS.get(name, DEFAULT_INDICATOR_TIMEOUT)
         try:
-            url = "https://api.alternative.me/fng/"
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    value = int(data['data'][0]['value'])
-                    classification = self._classify_fear_greed(value)
-                    return f"😱 恐慌贪婪指数: {value} - {classification}"
+            with tool_seconds.time(tool=f"crypto_analysis.{name}"):
+                return await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Indicator %s timed out after %ss", name, timeout)
         except Exception as e:
-            print(f"Error getting fear & greed index: {e}")
+            logger.error("Error getting indicator %s: %s", name, e, exc_info=True)
         return None
 
+    async def _get_fear_greed_index(self, session: aiohttp.ClientSession) -> Optional[str]:
+        """获取恐慧指数（优先使用快照，其次缓存）"""
+        value = market_snapshot.get("fear_greed")
+        if value is not None:
+            return self._format_fear_greed(value)
+        return await indicator_cache.get_or_fetch(
+            "fear_greed",
+            lambda: self._fetch_fear_greed_index(session)
+        )
+
+    async def _fetch_fear_greed_index(self, session: aiohttp.ClientSession) -> Optional[str]:
+        """请求恐慧指数"""
+        value = await fetch_fear_greed_value(session)
+        return None if value is None else self._format_fear_greed(value)
+
+    def _format_fear_greed(self, value: int) -> str:
+        classification = self._classify_fear_greed(value)
+        return f"😱 恐慌贪婪指数: {value} - {classification}"
+
+    async def _get_price_history(self, session: aiohttp.ClientSession) -> Optional[DailySeries]:
+        """获取按天对齐的比特币价格历史（优先使用快照，其次缓存）"""
+        history = market_snapshot.get("price_history")
+        if history is not None:
+            return history
+        return await load_daily_series(session, "market-price")
+
     async def _get_rainbow_chart(self, session: aiohttp.ClientSession) -> Optional[str]:
         """获取彩虹图分析"""
-        try:
-            url = "https://api.blockchain.info/charts/market-price"
-            params = {
-                "timespan": "30days",
-                "format": "json"
-            }
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    current_price = data['values'][-1]['y']
-                    analysis = self._analyze_rainbow_price(current_price)
-                    return f"🌈 彩虹图分析: {analysis}"
-        except Exception as e:
-            print(f"Error getting rainbow chart: {e}")
-        return None
+        history = await self._get_price_history(session)
+        result = btc_indicators.rainbow(*history) if history else None
+        if result is None:
+            return None
+        return (
+            f"🌈 彩虹图分析: 价格处于'{result.band_name}'区域"
+            f"（第 {result.band + 1}/{len(btc_indicators.RAINBOW_BANDS)} 档，"
+            f"回归价格 ${result.fair_price:,.0f}）"
+        )
 
     async def _get_stock_to_flow(self, session: aiohttp.ClientSession) -> Optional[str]:
         """获取S2F模型分析"""
-        try:
-            # 这里应该调用实际的S2F API
-            # 目前返回模拟数据
-            return "📈 S2F模型分析: 当前价格处于模型预测范围的下方，可能被低估"
-        except Exception as e:
-            print(f"Error getting S2F analysis: {e}")
-        return None
+        history = await self._get_price_history(session)
+        result = btc_indicators.stock_to_flow(*history) if history else None
+        if result is None:
+            return None
+        deviation = result.deviation
+        if deviation < -0.3:
+            analysis = "明显低于模型价格，可能被低估"
+        elif deviation > 0.3:
+            analysis = "明显高于模型价格，可能被高估"
+        else:
+            analysis = "接近模型价格"
+        return (
+            f"📈 S2F模型分析: S2F {result.ratio:.1f}，模型价格 ${result.model_price:,.0f}，"
+            f"当前价格{analysis}（{deviation:+.0%}）"
+        )
+
+    async def _get_pi_cycle(self, session: aiohttp.ClientSession) -> Optional[str]:
+        """获取Pi周期顶部指标"""
+        history = await self._get_price_history(session)
+        result = btc_indicators.pi_cycle(*history) if history else None
+        if result is None:
+            return None
+        if result.ratio >= 1:
+            analysis = "111DMA 已上穿 2×350DMA，历史上对应周期顶部"
+        elif result.ratio >= 0.9:
+            analysis = "111DMA 接近 2×350DMA，注意顶部风险"
+        else:
+            analysis = "距离顶部信号较远"
+        last_cross = ""
+        if result.last_cross_day is not None:
+            date = datetime.fromtimestamp(result.last_cross_day * btc_indicators.DAY, timezone.utc)
+            last_cross = f"，上次交叉 {date:%Y-%m-%d}"
+        return (
+            f"🥧 Pi周期指标: 111DMA ${result.ma111:,.0f} / 2×350DMA ${result.ma350x2:,.0f}"
+            f"（{result.ratio:.2f}）- {analysis}{last_cross}"
+        )
 
     async def _get_mvrv_zscore(self, session: aiohttp.ClientSession) -> Optional[str]:
         """获取MVRV Z-Score分析"""
-        try:
-            # 这里应该调用实际的MVRV API
-            # 目前返回模拟数据
-            return "📊 MVRV Z-Score: 2.1 - 市场估值适中，未到极端区域"
-        except Exception as e:
-            print(f"Error getting MVRV Z-Score: {e}")
-        return None
+        history = await self._get_price_history(session)
+        if not history:
+            return None
+        mvrv = market_snapshot.get("mvrv_history")
+        if mvrv is None:
+            mvrv = await load_daily_series(session, "mvrv")
+        result = btc_indicators.mvrv_zscore(*history, *mvrv) if mvrv else None
+        if result is None:
+            return None
+        if result.zscore > 7:
+            analysis = "极度高估，处于历史顶部区域"
+        elif result.zscore > 3:
+            analysis = "估值偏高"
+        elif result.zscore < 0:
+            analysis = "市值低于实现市值，处于历史底部区域"
+        else:
+            analysis = "市场估值适中，未到极端区域"
+        return f"📊 MVRV Z-Score: {result.zscore:.2f}（MVRV {result.mvrv:.2f}）- {analysis}"
 
     async def _get_mining_analysis(self, session: aiohttp.ClientSession) -> Optional[str]:
-        """获取矿工收入分析"""
-        try:
-            # 这里应该调用实际的矿工数据API
-            # 目前返回模拟数据
-            return "⛏️ 矿工收入分析: 矿工收入稳定，哈希率处于历史高位"
-        except Exception as e:
-            print(f"Error getting mining analysis: {e}")
-        return None
+        """获取矿工收入分析（Puell 倍数）"""
+        history = await self._get_price_history(session)
+        result = btc_indicators.puell_multiple(*history) if history else None
+        if result is None:
+            return None
+        if result.multiple < 0.5:
+            analysis = "矿工收入处于历史低位，历史上对应底部区域"
+        elif result.multiple > 4:
+            analysis = "矿工收入极高，历史上对应顶部区域"
+        elif result.multiple > 2:
+            analysis = "矿工收入偏高"
+        else:
+            analysis = "矿工收入处于正常范围"
+        return (
+            f"⛏️ 矿工收入分析: Puell 倍数 {result.multiple:.2f}，"
+            f"日发行价值 ${result.daily_issuance_usd:,.0f} - {analysis}"
+        )
 
     def _classify_fear_greed(self, value: int) -> str:
         """将恐慌贪婪指数分类"""
@@ -160,16 +358,6 @@ class CryptoAnalysisTool(BaseTool):
         else:
             return "极度贪婪"
 
-    def _analyze_rainbow_price(self, price: float) -> str:
-        """分析彩虹图位置"""
-        # 这里应该有更复杂的彩虹图计算逻辑
-        if price < 30000:
-            return "价格处于'极度低估'区域"
-        elif price < 50000:
-            return "价格处于'低估'区域"
-        else:
-            return "价格处于'合理'区域"
-
     def _run(self, crypto_id: str, indicators: List[str] = ["all"]) -> str:
         """同步版本 - 不实现"""
         raise NotImplementedError("请使用异步版本") 
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""本地价格历史归档
+
+每个序列（如 market-price、mvrv）一组定长列文件：
+- <name>.ts：int64 时间戳（秒）
+- <name>.px：float64 数值
+
+文件只追加，读取时通过内存映射直接访问，冷启动不需要读入整个文件；
+按时间窗口查询返回映射上的切片，不复制数据。
+
+多个 worker 进程共用归档目录：追加时持有 <name>.lock 文件锁，并在锁内
+重新映射文件，再决定哪些点是新的。
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+import logging
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，只支持单进程使用归档目录
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_DTYPE = np.dtype("<i8")
+VALUE_DTYPE = np.dtype("<f8")
+
+_EMPTY = (np.empty(0, dtype=TIMESTAMP_DTYPE), np.empty(0, dtype=VALUE_DTYPE))
+
+
+class PriceArchive:
+    """按序列存放、只追加的内存映射历史数据"""
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory: 归档目录，为空时不启用
+        """
+        self.directory: Optional[Path] = None
+        self._maps: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        if directory:
+            self.open(directory)
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def open(self, directory: Optional[str]) -> None:
+        """切换归档目录，为空时关闭归档"""
+        self._maps.clear()
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, name: str) -> Tuple[Path, Path]:
+        return self.directory / f"{name}.ts", self.directory / f"{name}.px"
+
+    def _lengths(self, name: str) -> Tuple[int, int, int]:
+        """(完整的点数, 时间戳文件点数, 数值文件点数)，文件不存在时为 0"""
+        ts_path, px_path = self._paths(name)
+        ts_count = ts_path.stat().st_size // TIMESTAMP_DTYPE.itemsize if ts_path.exists() else 0
+        px_count = px_path.stat().st_size // VALUE_DTYPE.itemsize if px_path.exists() else 0
+        return min(ts_count, px_count), ts_count, px_count
+
+    def _load(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """映射序列文件，两个文件长度不一致时（写入中断或正在写入）只映射较短的长度"""
+        length, _, _ = self._lengths(name)
+        if length == 0:
+            return _EMPTY
+        ts_path, px_path = self._paths(name)
+        return (
+            np.memmap(ts_path, dtype=TIMESTAMP_DTYPE, mode="r", shape=(length,)),
+            np.memmap(px_path, dtype=VALUE_DTYPE, mode="r", shape=(length,)),
+        )
+
+    @contextmanager
+    def _locked(self, name: str) -> Iterator[None]:
+        """持有序列的文件锁（跨进程互斥）"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.directory / f"{name}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def series(
+        self,
+        name: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """获取 [start, end) 时间范围内的 (时间戳, 数值)，返回只读的内存映射切片"""
+        if self.directory is None:
+            return _EMPTY
+        mapped = self._maps.get(name)
+        if mapped is None:
+            mapped = self._maps[name] = self._load(name)
+        timestamps, values = mapped
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="left"))
+        return timestamps[lo:hi], values[lo:hi]
+
+    def last_timestamp(self, name: str) -> Optional[int]:
+        """最后一个点的时间戳，没有数据时返回 None"""
+        timestamps, _ = self.series(name)
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    def append(self, name: str, timestamps: Sequence[int], values: Sequence[float]) -> int:
+        """追加晚于已有数据的点（时间戳需升序），返回追加的点数"""
+        if self.directory is None:
+            return 0
+        timestamps = np.asarray(timestamps, dtype=TIMESTAMP_DTYPE)
+        values = np.asarray(values, dtype=VALUE_DTYPE)
+
+        with self._locked(name):
+            # 其他进程可能已经追加过，丢弃本进程的旧映射，按当前文件判断新数据；
+            # 已返回的切片仍指向旧映射，不受影响
+            self._maps.pop(name, None)
+            ts_path, px_path = self._paths(name)
+            length, ts_count, px_count = self._lengths(name)
+            if ts_count != length or px_count != length:
+                # 上次写入中断，截断到较短的文件
+                logger.warning("Truncating %s archive to %s points", name, length)
+                for path, dtype in ((ts_path, TIMESTAMP_DTYPE), (px_path, VALUE_DTYPE)):
+                    if path.exists():
+                        with open(path, "r+b") as f:
+                            f.truncate(length * dtype.itemsize)
+
+            last = self.last_timestamp(name)
+            if last is not None:
+                keep = timestamps > last
+                timestamps, values = timestamps[keep], values[keep]
+            if len(timestamps) == 0:
+                return 0
+
+            # 先写数值再写时间戳，中断时读取只映射较短的长度
+            with open(px_path, "ab") as f:
+                f.write(values.tobytes())
+            with open(ts_path, "ab") as f:
+                f.write(timestamps.tobytes())
+            self._maps.pop(name, None)
+        return len(timestamps)
+
+
+# 全局归档实例（由 ChatBot 按配置打开）
+price_archive = PriceArchive()
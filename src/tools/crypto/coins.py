@@ -0,0 +1,231 @@
+"""币种解析索引
+
+把用户写法（简写、名称、CoinGecko ID、中文名）解析为 CoinGecko ID。
+
+- 内置的 CRYPTO_MAP / CRYPTO_ZH_MAP 优先级最高
+- 完整币种列表来自 CoinGecko /coins/list，市值排名来自 /coins/markets，
+  保存在本地文件中，过期后在后台刷新
+- 同一写法对应多个币种时取市值排名最高的
+- 键按排序数组存放，精确查找和前缀查找都是二分；模糊查找（一次编辑）
+  只在有排名的币种中进行，使用删除邻域表
+
+索引在创建对话链时（线程池中）从本地文件加载；后台刷新时重建索引和
+写入文件也在线程池中进行，建好后整体替换，不阻塞事件循环。
+"""
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from .constants import CRYPTO_MAP, CRYPTO_ZH_MAP
+
+logger = logging.getLogger(__name__)
+
+# 参与排名（前缀和模糊查找）的币种数
+RANKED_COINS = 1000
+
+# 优先级：越小越优先
+BUILTIN_PRIORITY = 0
+UNRANKED_PRIORITY = 10 ** 6
+
+# 刷新失败后的重试间隔（秒）
+RETRY_INTERVAL = 600
+
+# 前缀和模糊查找的最短输入长度
+MIN_PREFIX_LENGTH = 3
+MIN_FUZZY_LENGTH = 4
+
+
+def _deletes(key: str) -> Set[str]:
+    """key 本身及删除一个字符得到的所有写法"""
+    return {key, *(key[:i] + key[i + 1:] for i in range(len(key)))}
+
+
+class _IndexData(NamedTuple):
+    """建好的索引，整体替换"""
+    keys: List[str]
+    ids: List[str]
+    priorities: List[int]
+    all_ids: Set[str]
+    # 删除邻域 -> keys 下标，只包含有排名的币种
+    fuzzy: Dict[str, List[int]]
+
+
+def _build_index(coins: List[list]) -> _IndexData:
+    """coins 每项为 [id, symbol, name, 市值排名或 None]（不访问共享状态，可在线程池中运行）"""
+    best: Dict[str, Tuple[int, str]] = {}
+
+    def add(key: str, crypto_id: str, priority: int) -> None:
+        key = key.strip().lower()
+        if key and (key not in best or priority < best[key][0]):
+            best[key] = (priority, crypto_id)
+
+    for term, crypto_id in {**CRYPTO_ZH_MAP, **CRYPTO_MAP}.items():
+        add(term, crypto_id, BUILTIN_PRIORITY)
+        add(crypto_id, crypto_id, BUILTIN_PRIORITY)
+    for crypto_id, symbol, name, rank in coins:
+        priority = rank if rank else UNRANKED_PRIORITY
+        add(crypto_id, crypto_id, priority)
+        add(symbol, crypto_id, priority)
+        add(name, crypto_id, priority)
+
+    keys = sorted(best)
+    priorities = [best[key][0] for key in keys]
+    fuzzy: Dict[str, List[int]] = {}
+    for i, key in enumerate(keys):
+        if priorities[i] < UNRANKED_PRIORITY and len(key) >= MIN_FUZZY_LENGTH - 1:
+            for variant in _deletes(key):
+                fuzzy.setdefault(variant, []).append(i)
+    return _IndexData(
+        keys=keys,
+        ids=[best[key][1] for key in keys],
+        priorities=priorities,
+        all_ids={coin[0] for coin in coins},
+        fuzzy=fuzzy,
+    )
+
+
+class CoinIndex:
+    """币种写法到 CoinGecko ID 的索引"""
+
+    def __init__(self, path: Optional[str] = None, max_age: float = 86400):
+        """
+        Args:
+            path: 币种列表的本地缓存文件，为空时只使用内置映射
+            max_age: 币种列表的刷新间隔（秒）
+        """
+        self.path = Path(path) if path else None
+        self.max_age = max_age
+        self.updated_at = 0.0
+        self._loaded = False
+        self._keys: List[str] = []
+        self._ids: List[str] = []
+        self._priorities: List[int] = []
+        self._all_ids: Set[str] = set()
+        self._fuzzy: Dict[str, List[int]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def configure(self, path: Optional[str], max_age: float) -> None:
+        """设置缓存文件和刷新间隔，之后调用 load 或在下次查找时重新加载"""
+        self.path = Path(path) if path else None
+        self.max_age = max_age
+        self._loaded = False
+
+    @property
+    def complete(self) -> bool:
+        """是否已加载完整的币种列表（此时查不到的写法不必再请求 API）"""
+        self._ensure_loaded()
+        return bool(self._all_ids)
+
+    def load(self) -> None:
+        """从本地文件加载并建立索引（读文件和建索引较慢，应在线程池中调用）"""
+        coins: List[list] = []
+        updated_at = 0.0
+        if self.path is not None and self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                coins = data["coins"]
+                updated_at = float(data["updated_at"])
+            except Exception as e:
+                logger.error("Error loading coin list %s: %s", self.path, e, exc_info=True)
+                coins = []
+        self._install(_build_index(coins), updated_at)
+
+    def _ensure_loaded(self) -> None:
+        # 正常情况下已在创建对话链时加载，这里只是兜底
+        if not self._loaded:
+            self.load()
+
+    def _install(self, index: _IndexData, updated_at: float) -> None:
+        self._keys, self._ids, self._priorities, self._all_ids, self._fuzzy = index
+        self.updated_at = updated_at
+        self._loaded = True
+
+    def _exact(self, key: str) -> Optional[int]:
+        i = bisect_left(self._keys, key)
+        return i if i < len(self._keys) and self._keys[i] == key else None
+
+    def lookup(self, text: str, ranked_only: bool = False) -> Optional[str]:
+        """精确查找，找不到时返回 None；ranked_only 为 True 时只查内置和有排名的币种"""
+        self._ensure_loaded()
+        i = self._exact(text.strip().lower())
+        if i is None or (ranked_only and self._priorities[i] >= UNRANKED_PRIORITY):
+            return None
+        return self._ids[i]
+
+    def prefix(self, text: str, limit: int = 5) -> List[str]:
+        """以 text 开头的有排名币种，按排名排序"""
+        self._ensure_loaded()
+        key = text.strip().lower()
+        if len(key) < MIN_PREFIX_LENGTH:
+            return []
+        start = bisect_left(self._keys, key)
+        end = bisect_left(self._keys, key + "\uffff", start)
+        matches = sorted(
+            (self._priorities[i], self._ids[i])
+            for i in range(start, end)
+            if self._priorities[i] < UNRANKED_PRIORITY
+        )
+        return list(dict.fromkeys(crypto_id for _, crypto_id in matches))[:limit]
+
+    def fuzzy(self, text: str) -> Optional[str]:
+        """一次编辑（增删改或相邻交换）以内的有排名币种，取排名最高的"""
+        self._ensure_loaded()
+        key = text.strip().lower()
+        if len(key) < MIN_FUZZY_LENGTH:
+            return None
+        candidates = {i for variant in _deletes(key) for i in self._fuzzy.get(variant, ())}
+        if not candidates:
+            return None
+        return self._ids[min(candidates, key=lambda i: self._priorities[i])]
+
+    def resolve(self, text: str) -> Optional[str]:
+        """依次尝试精确、前缀和模糊查找"""
+        crypto_id = self.lookup(text)
+        if crypto_id is None:
+            matches = self.prefix(text, limit=1)
+            crypto_id = matches[0] if matches else self.fuzzy(text)
+        return crypto_id
+
+    def maybe_refresh(self) -> None:
+        """币种列表过期时在后台刷新（需在事件循环中调用）"""
+        self._ensure_loaded()
+        if self.path is None or time.time() - self.updated_at < self.max_age:
+            return
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def refresh(self) -> None:
+        """请求币种列表和市值排名，重建索引并写入本地文件"""
+        # 延迟导入，避免与 price.py 循环引用
+        from .price import request_coin_list
+        coins = await request_coin_list(RANKED_COINS)
+        if not coins:
+            # 请求失败时过一段时间再试，避免每次查找都请求
+            self.updated_at = time.time() - self.max_age + RETRY_INTERVAL
+            return
+        updated_at = time.time()
+        # 建索引和写文件在线程池中进行，建好后在事件循环中整体替换
+        loop = asyncio.get_running_loop()
+        index = await loop.run_in_executor(None, _build_index, coins)
+        self._install(index, updated_at)
+        if self.path is not None:
+            await loop.run_in_executor(None, self._save, coins, updated_at)
+        logger.info("Coin index refreshed: %s coins", len(coins))
+
+    def _save(self, coins: List[list], updated_at: float) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 每次写入使用唯一的临时文件，多个 worker 同时刷新时不会互相覆盖
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=self.path.parent, suffix=".tmp", delete=False
+        ) as f:
+            json.dump({"updated_at": updated_at, "coins": coins}, f, ensure_ascii=False)
+        os.replace(f.name, self.path)
+
+
+# 全局索引实例（由 ChatBot 按配置设置缓存文件）
+coin_index = CoinIndex()
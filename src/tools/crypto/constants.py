@@ -31,6 +31,68 @@ CRYPTO_MAP = {
     "cardano": "cardano",
 }
 
+# 中文名称映射
+CRYPTO_ZH_MAP = {
+    "比特币": "bitcoin",
+    "大饼": "bitcoin",
+    "以太坊": "ethereum",
+    "以太": "ethereum",
+    "币安币": "binancecoin",
+    "索拉纳": "solana",
+    "瑞波币": "ripple",
+    "艾达币": "cardano",
+    "狗狗币": "dogecoin",
+    "泰达币": "tether",
+    "波卡": "polkadot",
+    "雪崩": "avalanche-2",
+    "莱特币": "litecoin",
+    "波场": "tron",
+    "柴犬币": "shiba-inu",
+    "佩佩": "pepe",
+}
+
+# 计价货币映射（输入写法 -> CoinGecko vs_currency）
+VS_CURRENCY_MAP = {
+    "usd": "usd",
+    "美元": "usd",
+    "cny": "cny",
+    "rmb": "cny",
+    "人民币": "cny",
+    "eur": "eur",
+    "欧元": "eur",
+    "jpy": "jpy",
+    "日元": "jpy",
+    "krw": "krw",
+    "韩元": "krw",
+    "hkd": "hkd",
+    "港币": "hkd",
+    "gbp": "gbp",
+    "英镑": "gbp",
+}
+
+# 计价货币符号
+VS_CURRENCY_SYMBOLS = {
+    "usd": "$",
+    "cny": "¥",
+    "eur": "€",
+    "jpy": "¥",
+    "krw": "₩",
+    "hkd": "HK$",
+    "gbp": "£",
+}
+
+# 查询中常见的英文词，不当作币种写法（CoinGecko 上有不少同名的小币种）
+STOP_WORDS = {
+    "price", "prices", "of", "in", "and", "or", "to", "for", "vs", "the", "a", "an",
+    "is", "are", "what", "how", "much", "now", "current", "today", "check", "me",
+    "analysis", "analyze", "trend",
+}
+
+# 同时是常用词的币种写法，只在价格/分析请求中当作币种（"check this link"、"市场雪崩了"）
+AMBIGUOUS_COIN_TERMS = {
+    "link", "dot", "uni", "dai", "ada", "sol", "雪崩", "佩佩",
+}
+
 # 支持的指标列表
 SUPPORTED_INDICATORS = [
     "fear_greed",    # 恐慌贪婪指数
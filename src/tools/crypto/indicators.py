@@ -0,0 +1,206 @@
+"""比特币估值指标
+
+所有指标都基于按天对齐的价格序列（见 daily_series），每个指标对整条
+序列做一次向量化计算，返回最新一天的结果。流通量按减半规则从日期推算，
+不需要额外请求。
+"""
+from typing import NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+
+DAY = 86400
+
+# 减半时的区块高度和时间（创世区块为第 0 个），用于从日期推算区块高度
+HALVING_HEIGHTS = np.array([0, 210000, 420000, 630000, 840000], dtype=np.float64)
+HALVING_TIMESTAMPS = np.array(
+    [1231006505, 1354116278, 1468082773, 1589225023, 1713571767],
+    dtype=np.float64,
+)
+GENESIS_DAY = int(HALVING_TIMESTAMPS[0]) // DAY
+BLOCK_INTERVAL = 600
+HALVING_INTERVAL = 210000
+INITIAL_SUBSIDY = 50.0
+
+# 彩虹图色带，从低到高
+RAINBOW_BANDS = [
+    "清仓甩卖",
+    "买入",
+    "积累",
+    "仍然便宜",
+    "持有",
+    "泡沫初现",
+    "FOMO 加剧",
+    "卖出",
+    "最大泡沫",
+]
+
+# 各指标需要的最少天数
+MIN_RAINBOW_DAYS = 365
+MIN_PI_CYCLE_DAYS = 350
+MIN_S2F_DAYS = 365
+MIN_PUELL_DAYS = 365
+
+
+class RainbowResult(NamedTuple):
+    price: float
+    fair_price: float  # 回归线上的价格
+    band: int          # RAINBOW_BANDS 中的位置
+
+    @property
+    def band_name(self) -> str:
+        return RAINBOW_BANDS[self.band]
+
+
+class PiCycleResult(NamedTuple):
+    ma111: float
+    ma350x2: float
+    last_cross_day: Optional[int]  # 最近一次 111DMA 上穿 2×350DMA 的天序号
+
+    @property
+    def ratio(self) -> float:
+        return self.ma111 / self.ma350x2
+
+
+class StockToFlowResult(NamedTuple):
+    ratio: float        # 存量/年产量
+    price: float
+    model_price: float
+
+    @property
+    def deviation(self) -> float:
+        """实际价格相对模型价格的偏离"""
+        return self.price / self.model_price - 1
+
+
+class MVRVResult(NamedTuple):
+    mvrv: float
+    zscore: float
+
+
+class PuellResult(NamedTuple):
+    multiple: float
+    daily_issuance_usd: float
+
+
+def daily_series(timestamps: Sequence[float], values: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """把按时间升序、间隔不等的序列线性插值到每天，返回 (天序号, 数值)"""
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    days = np.arange(int(timestamps[0]) // DAY, int(timestamps[-1]) // DAY + 1)
+    return days, np.interp(days * float(DAY), timestamps, values)
+
+
+def block_height(days: np.ndarray) -> np.ndarray:
+    """按减半时间分段插值推算每天的区块高度，最后一次减半之后按十分钟一个区块外推"""
+    timestamps = np.asarray(days, dtype=np.float64) * DAY
+    height = np.interp(timestamps, HALVING_TIMESTAMPS, HALVING_HEIGHTS, left=0.0)
+    after = timestamps > HALVING_TIMESTAMPS[-1]
+    height[after] = HALVING_HEIGHTS[-1] + (timestamps[after] - HALVING_TIMESTAMPS[-1]) / BLOCK_INTERVAL
+    return height
+
+
+def btc_supply(days: np.ndarray) -> np.ndarray:
+    """每天的比特币流通量"""
+    height = block_height(days)
+    epoch = np.floor(height / HALVING_INTERVAL)
+    mined = HALVING_INTERVAL * INITIAL_SUBSIDY * 2 * (1 - 0.5 ** epoch)
+    return mined + (height - epoch * HALVING_INTERVAL) * INITIAL_SUBSIDY * 0.5 ** epoch
+
+
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """简单移动平均，前 window-1 个位置为 NaN"""
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        cumsum = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+        result[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return result
+
+
+def rainbow(days: np.ndarray, prices: np.ndarray) -> Optional[RainbowResult]:
+    """对数回归彩虹图：log10(价格) 对 ln(创世以来天数) 做线性回归，
+    按历史残差的范围等分色带"""
+    mask = (days > GENESIS_DAY) & (prices > 0)
+    if mask.sum() < MIN_RAINBOW_DAYS or not mask[-1]:
+        return None
+    x = np.log(days[mask] - GENESIS_DAY)
+    y = np.log10(prices[mask])
+    slope, intercept = np.polyfit(x, y, 1)
+    residuals = y - (slope * x + intercept)
+    edges = np.linspace(residuals.min(), residuals.max(), len(RAINBOW_BANDS) + 1)
+    band = int(np.clip(np.searchsorted(edges, residuals[-1], side="right") - 1, 0, len(RAINBOW_BANDS) - 1))
+    return RainbowResult(
+        price=float(prices[-1]),
+        fair_price=float(10 ** (slope * x[-1] + intercept)),
+        band=band,
+    )
+
+
+def pi_cycle(days: np.ndarray, prices: np.ndarray) -> Optional[PiCycleResult]:
+    """Pi 周期顶部指标：111 日均线与 350 日均线的两倍"""
+    if len(prices) < MIN_PI_CYCLE_DAYS:
+        return None
+    ma111 = moving_average(prices, 111)
+    ma350x2 = 2 * moving_average(prices, 350)
+    above = ma111 > ma350x2  # NaN 比较结果为 False
+    crosses = np.flatnonzero(above[1:] & ~above[:-1]) + 1
+    return PiCycleResult(
+        ma111=float(ma111[-1]),
+        ma350x2=float(ma350x2[-1]),
+        last_cross_day=int(days[crosses[-1]]) if len(crosses) else None,
+    )
+
+
+def stock_to_flow(days: np.ndarray, prices: np.ndarray) -> Optional[StockToFlowResult]:
+    """S2F 模型：ln(价格) 对 ln(存量/年产量) 做线性回归"""
+    stock = btc_supply(days)
+    flow = stock - btc_supply(days - 365)
+    mask = (days >= GENESIS_DAY + 365) & (prices > 0) & (flow > 0)
+    if mask.sum() < MIN_S2F_DAYS or not mask[-1]:
+        return None
+    ratio = stock[mask] / flow[mask]
+    slope, intercept = np.polyfit(np.log(ratio), np.log(prices[mask]), 1)
+    return StockToFlowResult(
+        ratio=float(ratio[-1]),
+        price=float(prices[-1]),
+        model_price=float(np.exp(intercept + slope * np.log(ratio[-1]))),
+    )
+
+
+def mvrv_zscore(
+    days: np.ndarray,
+    prices: np.ndarray,
+    mvrv_days: np.ndarray,
+    mvrv_values: np.ndarray
+) -> Optional[MVRVResult]:
+    """MVRV Z-Score：(市值 - 实现市值) / 历史市值标准差
+
+    实现市值由市值和 MVRV 序列换算（市值 / MVRV）。
+    """
+    if len(mvrv_days) == 0 or days[-1] > mvrv_days[-1] + 7:
+        return None
+    mvrv = np.interp(days, mvrv_days, mvrv_values, left=np.nan)
+    mask = ~np.isnan(mvrv) & (mvrv > 0) & (prices > 0)
+    if mask.sum() < 2 or not mask[-1]:
+        return None
+    market_cap = prices[mask] * btc_supply(days[mask])
+    realized_cap = market_cap / mvrv[mask]
+    std = market_cap.std()
+    if std == 0:
+        return None
+    return MVRVResult(
+        mvrv=float(mvrv[mask][-1]),
+        zscore=float((market_cap[-1] - realized_cap[-1]) / std),
+    )
+
+
+def puell_multiple(days: np.ndarray, prices: np.ndarray) -> Optional[PuellResult]:
+    """Puell 倍数：当天新发行比特币的美元价值 / 过去 365 天的平均值"""
+    if len(prices) < MIN_PUELL_DAYS:
+        return None
+    issuance = (btc_supply(days + 1) - btc_supply(days)) * prices
+    average = issuance[-365:].mean()
+    if average <= 0:
+        return None
+    return PuellResult(
+        multiple=float(issuance[-1] / average),
+        daily_issuance_usd=float(issuance[-1]),
+    )
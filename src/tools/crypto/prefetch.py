@@ -0,0 +1,55 @@
+"""后台行情预取
+
+通过 telegram.ext 的 JobQueue 定期刷新 CRYPTO_MAP 中所有币种的价格、
+恐慌贪婪指数、比特币价格历史和 MVRV 序列，写入内存快照。
+"""
+import asyncio
+import logging
+from .analysis import fetch_fear_greed_value, load_daily_series
+from .constants import CRYPTO_MAP
+from .price import request_prices
+from .snapshot import MarketSnapshot, market_snapshot
+from ..http import get_session
+
+logger = logging.getLogger(__name__)
+
+
+class MarketDataPrefetcher:
+    """定期刷新行情快照"""
+
+    def __init__(self, snapshot: MarketSnapshot = market_snapshot):
+        self.snapshot = snapshot
+        # CRYPTO_MAP 中的所有目标币种，去重并保持顺序
+        self.crypto_ids = list(dict.fromkeys(CRYPTO_MAP.values()))
+
+    async def refresh(self) -> None:
+        """刷新全部行情数据，单项失败不影响其他数据"""
+        results = await asyncio.gather(
+            self._refresh_prices(),
+            self._refresh_fear_greed(),
+            self._refresh_history("price_history", "market-price"),
+            self._refresh_history("mvrv_history", "mvrv"),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning("Market data prefetch failed: %s", result)
+
+    async def _refresh_prices(self) -> None:
+        # 所有币种一次批量请求
+        data = await request_prices(self.crypto_ids, ["usd"])
+        for crypto_id, coin_data in data.items():
+            try:
+                self.snapshot.set_price(crypto_id, float(coin_data["usd"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    async def _refresh_fear_greed(self) -> None:
+        value = await fetch_fear_greed_value(get_session())
+        if value is not None:
+            self.snapshot.set("fear_greed", value)
+
+    async def _refresh_history(self, key: str, chart: str) -> None:
+        series = await load_daily_series(get_session(), chart, refresh=True)
+        if series:
+            self.snapshot.set(key, series)
@@ -1,98 +1,313 @@
-from typing import Optional, Type
+from typing import Dict, List, Optional, Type
 from langchain.tools import BaseTool
 from langchain.pydantic_v1 import BaseModel, Field
-import aiohttp
 import asyncio
-from .constants import CRYPTO_MAP
+import logging
+import re
+from .coins import coin_index
+from .constants import CRYPTO_ZH_MAP, STOP_WORDS, VS_CURRENCY_MAP, VS_CURRENCY_SYMBOLS
+from .snapshot import market_snapshot
+from ..cache import AsyncTTLCache
+from ..http import get_session
+from ..result import ToolResult
+from ...utils.metrics import http_rate_limited, http_retries, tool_seconds
+
+logger = logging.getLogger(__name__)
+
+# CoinGecko API 地址
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3"
+
+# 价格缓存：30 秒内直接命中，之后 90 秒内返回旧值并后台刷新
+price_cache = AsyncTTLCache(ttl=30, stale_ttl=90, maxsize=512, name="price")
+
+# 拆分输入中的币种/货币写法
+_TOKEN_PATTERN = re.compile(r"[a-z0-9\-]+")
+
+class PriceLookupError(Exception):
+    """价格查询失败，异常消息可直接回复给用户"""
 
 class CryptoPriceInput(BaseModel):
     """加密货币价格查询的输入参数"""
     crypto_id: str = Field(
-        description="加密货币的ID或简写，例如：bitcoin、btc"
+        description="加密货币的ID或简写，多个币种用空格或逗号分隔，例如：btc、btc eth sol"
     )
+    vs_currencies: str = Field(
+        default="usd",
+        description="计价货币，多个用逗号分隔，例如：usd、usd,cny"
+    )
+
+def extract_crypto_ids(text: str) -> List[str]:
+    """从输入中提取已知币种（简写、ID、名称或中文名），保持出现顺序并去重
+
+    拆分出的单词只匹配内置和有市值排名的币种，避免常见词匹配到同名小币种。
+    """
+    text = text.lower()
+    found = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        if token in VS_CURRENCY_MAP or token in STOP_WORDS:
+            continue
+        crypto_id = coin_index.lookup(token, ranked_only=True)
+        if crypto_id:
+            found.append((match.start(), crypto_id))
+    for name, crypto_id in CRYPTO_ZH_MAP.items():
+        index = text.find(name)
+        if index >= 0:
+            found.append((index, crypto_id))
+
+    crypto_ids = []
+    for _, crypto_id in sorted(found):
+        if crypto_id not in crypto_ids:
+            crypto_ids.append(crypto_id)
+    return crypto_ids
+
+def extract_vs_currencies(text: str) -> List[str]:
+    """从输入中提取计价货币"""
+    text = text.lower()
+    tokens = set(_TOKEN_PATTERN.findall(text))
+    currencies = []
+    for name, currency in VS_CURRENCY_MAP.items():
+        # 英文写法按词匹配，中文写法按子串匹配
+        matched = name in tokens if name.isascii() else name in text
+        if matched and currency not in currencies:
+            currencies.append(currency)
+    return currencies
+
+def _price_cache_key(crypto_id: str, currency: str):
+    """美元价格沿用单币种查询的缓存键"""
+    return crypto_id if currency == "usd" else (crypto_id, currency)
+
+async def request_prices(crypto_ids: List[str], currencies: List[str]) -> dict:
+    """请求 CoinGecko /simple/price，失败时抛出 PriceLookupError"""
+    label = ", ".join(crypto_ids)
+
+    # 最大重试次数
+    max_retries = 3
+    retry_delay = 1  # 秒
+
+    url = f"{COINGECKO_API_URL}/simple/price"
+    params = {
+        "ids": ",".join(crypto_ids),
+        "vs_currencies": ",".join(currencies)
+    }
+
+    for attempt in range(max_retries):
+        try:
+            session = get_session()
+            async with session.get(url, params=params) as response:
+                # 处理API限制
+                if response.status == 429:  # Too Many Requests
+                    http_rate_limited.inc(api="coingecko")
+                    if attempt < max_retries - 1:
+                        http_retries.inc(api="coingecko")
+                        await asyncio.sleep(retry_delay * (attempt + 1))
+                        continue
+                    raise PriceLookupError("抱歉，API 请求次数已达上限，请稍后再试")
+
+                # 处理其他HTTP错误
+                if response.status != 200:
+                    error_msg = await response.text()
+                    print(f"API Error: Status {response.status}, {error_msg}")
+                    raise PriceLookupError(f"获取 {label} 价格失败，请稍后再试")
+
+                try:
+                    data = await response.json()
+                except Exception as e:
+                    print(f"JSON decode error: {e}")
+                    raise PriceLookupError(f"解析 {label} 价格数据失败")
+
+                if not data:
+                    raise PriceLookupError(f"未收到 {label} 的价格数据")
+                return data
+
+        except PriceLookupError:
+            raise
+
+        except asyncio.TimeoutError:
+            if attempt < max_retries - 1:
+                http_retries.inc(api="coingecko")
+                await asyncio.sleep(retry_delay * (attempt + 1))
+                continue
+            raise PriceLookupError(f"查询 {label} 价格超时，请稍后再试")
+
+        except Exception as e:
+            print(f"Error getting crypto price: {e}")
+            if attempt < max_retries - 1:
+                http_retries.inc(api="coingecko")
+                await asyncio.sleep(retry_delay * (attempt + 1))
+                continue
+            raise PriceLookupError(f"查询 {label} 价格时出错，请稍后再试")
+
+    raise PriceLookupError(f"查询 {label} 价格时出错，请稍后再试")
+
+async def request_coin_list(ranked: int) -> Optional[List[list]]:
+    """请求 CoinGecko 完整币种列表和市值前 ranked 名的排名
+
+    返回的每项为 [id, symbol, name, 市值排名或 None]，失败时返回 None。
+    """
+    session = get_session()
+    try:
+        async with session.get(f"{COINGECKO_API_URL}/coins/list") as response:
+            if response.status == 429:
+                http_rate_limited.inc(api="coingecko")
+            if response.status != 200:
+                logger.warning("CoinGecko coin list request failed: status %s", response.status)
+                return None
+            coins = await response.json()
+
+        # 每页最多 250 个
+        ranks: Dict[str, int] = {}
+        for page in range(1, (ranked + 249) // 250 + 1):
+            params = {
+                "vs_currency": "usd",
+                "order": "market_cap_desc",
+                "per_page": "250",
+                "page": str(page),
+            }
+            async with session.get(f"{COINGECKO_API_URL}/coins/markets", params=params) as response:
+                if response.status == 429:
+                    http_rate_limited.inc(api="coingecko")
+                if response.status != 200:
+                    break
+                for item in await response.json():
+                    if item.get("market_cap_rank"):
+                        ranks[item["id"]] = int(item["market_cap_rank"])
+    except Exception as e:
+        logger.error("Error getting coin list: %s", e, exc_info=True)
+        return None
+
+    return [
+        [coin["id"], coin["symbol"], coin["name"], ranks.get(coin["id"])]
+        for coin in coins
+        if coin.get("id")
+    ]
 
 class CryptoPriceTool(BaseTool):
     name: str = "crypto_price"
-    description: str = "查询加密货币的当前价格"
+    description: str = (
+        "查询加密货币的当前价格。"
+        "支持一次查询多个币种（例如：btc eth sol）和多种计价货币（例如：usd,cny）"
+    )
     args_schema: Type[BaseModel] = CryptoPriceInput
     return_direct: bool = True
 
-    async def _arun(self, crypto_id: str) -> str:
+    async def _arun(self, crypto_id: str, vs_currencies: str = "usd") -> str:
         """查询加密货币价格"""
-        # 标准化输入
-        crypto_id = crypto_id.lower().strip()
-        crypto_id = CRYPTO_MAP.get(crypto_id, crypto_id)
+        return (await self.query(crypto_id, vs_currencies)).text
 
-        # 最大重试次数
-        max_retries = 3
-        retry_delay = 1  # 秒
+    @tool_seconds.time(tool="crypto_price")
+    async def query(self, crypto_id: str, vs_currencies: str = "usd") -> ToolResult:
+        """查询加密货币价格，查询失败时结果标记为不完整"""
+        # 币种列表过期时后台刷新，本次查找使用现有索引
+        coin_index.maybe_refresh()
+        # 整个输入是一个币种名称（如 "shiba inu"）时不再拆分；
+        # 只有小币种同名的输入由下面的 resolve 处理
+        whole = coin_index.lookup(crypto_id, ranked_only=True)
+        crypto_ids = [whole] if whole else extract_crypto_ids(crypto_id)
+        currencies = extract_vs_currencies(f"{crypto_id} {vs_currencies}") or ["usd"]
 
-        for attempt in range(max_retries):
-            try:
-                async with aiohttp.ClientSession() as session:
-                    # 添加请求头和超时设置
-                    headers = {
-                        "Accept": "application/json",
-                        "User-Agent": "Mozilla/5.0"
-                    }
-                    timeout = aiohttp.ClientTimeout(total=10)
-                    
-                    url = "https://api.coingecko.com/api/v3/simple/price"
-                    params = {
-                        "ids": crypto_id,
-                        "vs_currencies": "usd"
-                    }
-
-                    async with session.get(
-                        url, 
-                        params=params, 
-                        headers=headers,
-                        timeout=timeout
-                    ) as response:
-                        # 处理API限制
-                        if response.status == 429:  # Too Many Requests
-                            if attempt < max_retries - 1:
-                                await asyncio.sleep(retry_delay * (attempt + 1))
-                                continue
-                            return "抱歉，API 请求次数已达上限，请稍后再试"
-
-                        # 处理其他HTTP错误
-                        if response.status != 200:
-                            error_msg = await response.text()
-                            print(f"API Error: Status {response.status}, {error_msg}")
-                            return f"获取 {crypto_id} 价格失败，请稍后再试"
-
-                        try:
-                            data = await response.json()
-                        except Exception as e:
-                            print(f"JSON decode error: {e}")
-                            return f"解析 {crypto_id} 价格数据失败"
-
-                        if not data:
-                            return f"未收到 {crypto_id} 的价格数据"
-
-                        if crypto_id in data:
-                            try:
-                                price = data[crypto_id]["usd"]
-                                return f"{crypto_id.upper()} 当前价格: ${price:,.2f} USD"
-                            except (KeyError, TypeError) as e:
-                                print(f"Price data format error: {e}")
-                                return f"价格数据格式错误: {crypto_id}"
-                        return f"未找到 {crypto_id} 的价格信息"
-
-            except asyncio.TimeoutError:
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay * (attempt + 1))
-                    continue
-                return f"查询 {crypto_id} 价格超时，请稍后再试"
+        # 多币种时批量查询
+        if len(crypto_ids) > 1:
+            return await self._arun_batch(crypto_ids, currencies)
+
+        # 标准化输入：精确匹配失败时尝试前缀和模糊匹配
+        if crypto_ids:
+            crypto_id = crypto_ids[0]
+        else:
+            raw_id = crypto_id.lower().strip()
+            crypto_id = coin_index.resolve(raw_id)
+            if crypto_id is None:
+                # 完整币种列表中也没有时不再请求 API
+                if coin_index.complete:
+                    return ToolResult(f"未找到 {raw_id} 对应的币种")
+                crypto_id = raw_id
 
-            except Exception as e:
-                print(f"Error getting crypto price: {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay * (attempt + 1))
+        # 非美元计价同样走批量查询，按请求的货币返回价格
+        if currencies != ["usd"]:
+            return await self._arun_batch([crypto_id], currencies)
+
+        # 优先使用后台预取的快照
+        price = market_snapshot.get_price(crypto_id)
+        if price is not None:
+            return ToolResult(f"{crypto_id.upper()} 当前价格: ${price:,.2f} USD")
+
+        try:
+            price = await price_cache.get_or_fetch(
+                crypto_id,
+                lambda: self._fetch_price(crypto_id)
+            )
+        except PriceLookupError as e:
+            return ToolResult(str(e), complete=False)
+        return ToolResult(f"{crypto_id.upper()} 当前价格: ${price:,.2f} USD")
+
+    async def _arun_batch(self, crypto_ids: List[str], currencies: List[str]) -> ToolResult:
+        """一次请求查询多个币种，返回价格表"""
+        try:
+            prices = await self._fetch_prices(crypto_ids, currencies)
+        except PriceLookupError as e:
+            return ToolResult(str(e), complete=False)
+
+        lines = ["币种 | " + " | ".join(currency.upper() for currency in currencies)]
+        for crypto_id in crypto_ids:
+            coin_prices = prices.get(crypto_id)
+            if not coin_prices:
+                lines.append(f"{crypto_id.upper()} | 未找到价格信息")
+                continue
+            cells = []
+            for currency in currencies:
+                price = coin_prices.get(currency)
+                symbol = VS_CURRENCY_SYMBOLS.get(currency, "")
+                cells.append(f"{symbol}{price:,.2f}" if price is not None else "-")
+            lines.append(f"{crypto_id.upper()} | " + " | ".join(cells))
+        return ToolResult("\n".join(lines), complete=all(crypto_id in prices for crypto_id in crypto_ids))
+
+    async def _fetch_prices(
+        self,
+        crypto_ids: List[str],
+        currencies: List[str]
+    ) -> Dict[str, Dict[str, float]]:
+        """批量获取价格，已缓存的价格不重复请求"""
+        prices: Dict[str, Dict[str, float]] = {}
+        missing = []
+        for crypto_id in crypto_ids:
+            for currency in currencies:
+                price = market_snapshot.get_price(crypto_id) if currency == "usd" else None
+                if price is None:
+                    price = price_cache.get(_price_cache_key(crypto_id, currency))
+                if price is None:
+                    if crypto_id not in missing:
+                        missing.append(crypto_id)
+                else:
+                    prices.setdefault(crypto_id, {})[currency] = price
+
+        if not missing:
+            return prices
+
+        data = await request_prices(missing, currencies)
+        for crypto_id in missing:
+            coin_data = data.get(crypto_id)
+            if not isinstance(coin_data, dict):
+                continue
+            for currency in currencies:
+                try:
+                    price = float(coin_data[currency])
+                except (KeyError, TypeError, ValueError):
                     continue
-                return f"查询 {crypto_id} 价格时出错，请稍后再试"
+                price_cache.set(_price_cache_key(crypto_id, currency), price)
+                prices.setdefault(crypto_id, {})[currency] = price
+        return prices
+
+    async def _fetch_price(self, crypto_id: str) -> float:
+        """从 CoinGecko 获取价格，失败时抛出 PriceLookupError"""
+        data = await request_prices([crypto_id], ["usd"])
+        if crypto_id in data:
+            try:
+                return float(data[crypto_id]["usd"])
+            except (KeyError, TypeError) as e:
+                print(f"Price data format error: {e}")
+                raise PriceLookupError(f"价格数据格式错误: {crypto_id}")
+        raise PriceLookupError(f"未找到 {crypto_id} 的价格信息")
 
-    def _run(self, crypto_id: str) -> str:
+    def _run(self, crypto_id: str, vs_currencies: str = "usd") -> str:
         """同步版本 - 不实现"""
-        raise NotImplementedError("请使用异步版本") 
\ No newline at end of file
+        raise NotImplementedError("请使用异步版本")
@@ -0,0 +1,51 @@
+"""内存中的行情快照
+
+后台预取任务定期写入价格、恐慌指数和价格序列，工具优先从这里读取，
+数据过期时再回退到实时请求。
+"""
+from typing import Any, Dict, Hashable, Optional, Tuple
+import time
+
+
+class MarketSnapshot:
+    """带时间戳的行情快照"""
+
+    def __init__(self, max_age: float = 120):
+        # 超过 max_age 秒的数据视为过期
+        self.max_age = max_age
+        self._values: Dict[Hashable, Tuple[Any, float]] = {}
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """写入快照数据"""
+        self._values[key] = (value, time.monotonic())
+
+    def get(self, key: Hashable, max_age: Optional[float] = None) -> Optional[Any]:
+        """读取未过期的快照数据"""
+        item = self._values.get(key)
+        if item is None:
+            return None
+        value, updated_at = item
+        if time.monotonic() - updated_at > (self.max_age if max_age is None else max_age):
+            return None
+        return value
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """获取数据距上次更新的秒数"""
+        item = self._values.get(key)
+        return None if item is None else time.monotonic() - item[1]
+
+    def set_price(self, crypto_id: str, price: float) -> None:
+        """写入美元价格"""
+        self.set(("price", crypto_id), price)
+
+    def get_price(self, crypto_id: str) -> Optional[float]:
+        """读取美元价格"""
+        return self.get(("price", crypto_id))
+
+    def clear(self) -> None:
+        """清空快照"""
+        self._values.clear()
+
+
+# 全局快照实例
+market_snapshot = MarketSnapshot()
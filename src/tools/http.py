@@ -0,0 +1,78 @@
+"""工具共享的 HTTP 客户端
+
+所有工具共用一个带连接池的 aiohttp 会话，避免每次请求都重新建立
+TCP/TLS 连接。会话随 Telegram Application 的生命周期启动和关闭。
+"""
+from typing import Dict, Optional
+import logging
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# 默认请求头
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "User-Agent": "Mozilla/5.0"
+}
+
+# 默认超时（秒）
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=5)
+
+
+class HttpClient:
+    """进程级 HTTP 客户端，持有共享的连接池"""
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        ttl_dns_cache: int = 300,
+        keepalive_timeout: float = 30,
+        timeout: aiohttp.ClientTimeout = DEFAULT_TIMEOUT,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.ttl_dns_cache = ttl_dns_cache
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.headers = headers or DEFAULT_HEADERS
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """获取共享会话，未启动时自动创建（需在事件循环中调用）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.ttl_dns_cache,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers=self.headers,
+            )
+            logger.info("HTTP session started")
+        return self._session
+
+    async def start(self) -> aiohttp.ClientSession:
+        """启动共享会话"""
+        return self.session
+
+    async def close(self) -> None:
+        """关闭共享会话及其连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("HTTP session closed")
+        self._session = None
+
+
+# 全局客户端实例
+http_client = HttpClient()
+
+
+def get_session() -> aiohttp.ClientSession:
+    """获取全局共享的 HTTP 会话"""
+    return http_client.session
@@ -0,0 +1,12 @@
+"""工具的查询结果"""
+from typing import NamedTuple
+
+
+class ToolResult(NamedTuple):
+    """工具的回答
+
+    complete 为 False 表示查询失败或有数据缺失（上游出错、限流、超时），
+    回答仍可返回给用户，但不应被缓存。
+    """
+    text: str
+    complete: bool = True
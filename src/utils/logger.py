@@ -1,19 +1,72 @@
+import atexit
+import copy
+import json
 import logging
+import queue
+import random
 import sys
+from datetime import datetime, timezone
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# 当前进程的日志监听线程
+_listener = None
+
+# 请求日志过多的第三方库
+NOISY_LOGGERS = ["httpx", "httpcore", "aiohttp.access"]
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class _QueueHandler(QueueHandler):
+    """只在调用线程中合并消息参数，格式化留给监听线程"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # 异常对象不跨线程传递，先转成文本
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logger(bot_name: str, level: str = "INFO", json_format: bool = False):
+    """设置日志记录器
+
+    日志先放入内存队列，由后台线程写入文件和控制台，
+    磁盘写入不会阻塞事件循环。
+    """
+    global _listener
 
-def setup_logger(bot_name: str):
-    """设置日志记录器"""
     # 创建日志目录
     log_dir = Path("logs") / bot_name
     log_dir.mkdir(parents=True, exist_ok=True)
     log_file = log_dir / "bot.log"
 
     # 创建格式化器
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
 
     # 设置文件处理器
     file_handler = RotatingFileHandler(
@@ -28,10 +81,31 @@ def setup_logger(bot_name: str):
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
 
+    # 重复调用时先停止之前的监听线程
+    if _listener is not None:
+        atexit.unregister(_listener.stop)
+        _listener.stop()
+
+    # 后台线程负责实际写入
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, file_handler, console_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
     # 配置根日志记录器
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
+    root_logger.setLevel(level.upper())
+    for handler in list(root_logger.handlers):
+        if isinstance(handler, QueueHandler):
+            root_logger.removeHandler(handler)
+    root_logger.addHandler(_QueueHandler(log_queue))
+
+    for name in NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    return root_logger
+
 
-    return root_logger 
\ No newline at end of file
+def sampled(rate: float) -> bool:
+    """按比例抽样，用于只记录部分请求的详细日志"""
+    return rate >= 1 or random.random() < rate
@@ -0,0 +1,297 @@
+"""进程内指标和 Prometheus 文本格式输出
+
+只实现机器人用到的计数器和直方图，不依赖 prometheus_client。
+通过 MetricsServer 在本地 HTTP 端口的 /metrics 上输出。
+
+用法：
+    with stage_seconds.time(stage="route", chat_id=chat_id):
+        ...
+
+    @tool_seconds.time(tool="crypto_price")
+    async def _arun(...):
+        ...
+"""
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+import functools
+import logging
+import math
+import threading
+import time
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# 每个指标最多保留的标签组合数，超出后归入 "other"，避免群组过多时内存无限增长
+MAX_SERIES = 5000
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        f'{name}="{value}"'.replace("\n", "\\n")
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """带标签的指标基类"""
+    type_name = ""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        if key not in self._series() and len(self._series()) >= MAX_SERIES:
+            key = tuple("other" for _ in self.labelnames)
+        return key
+
+    def _series(self) -> dict:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def _series(self) -> dict:
+        return self._values
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        with self._lock:
+            key = self._key(labels)
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class _Timer:
+    """计时上下文，也可作为异步函数的装饰器"""
+
+    def __init__(self, histogram: "Histogram", labels: Dict[str, object]):
+        self.histogram = histogram
+        self.labels = labels
+        self._started = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self._started, **self.labels)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return await func(*args, **kwargs)
+        return wrapper
+
+
+class Histogram(_Metric):
+    """按分桶统计耗时分布"""
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[LabelValues, _HistogramSeries] = {}
+
+    def _series(self) -> dict:
+        return self._values
+
+    def observe(self, value: float, **labels) -> None:
+        with self._lock:
+            key = self._key(labels)
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = _HistogramSeries(len(self.buckets))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series.counts[index] += 1
+                    break
+            series.total += value
+            series.count += 1
+
+    def time(self, **labels) -> _Timer:
+        """返回计时上下文/装饰器"""
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = [(key, list(s.counts), s.total, s.count) for key, s in self._values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, description, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, description, labelnames, buckets))
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """在本地端口提供 /metrics"""
+
+    def __init__(self, registry: MetricsRegistry, listen: str = "127.0.0.1", port: int = 9100):
+        self.registry = registry
+        self.listen = listen
+        self.port = port
+        self._runner: Optional["web.AppRunner"] = None
+
+    async def handle_metrics(self, request: "web.Request") -> "web.Response":
+        from aiohttp import web
+        return web.Response(
+            text=self.registry.render(),
+            content_type="text/plain",
+            headers={"X-Content-Type-Options": "nosniff"},
+        )
+
+    async def start(self) -> None:
+        # 延迟导入：指标模块在启动时就被导入，aiohttp 只有开启端点时才需要
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        logger.info("Metrics available at http://%s:%s/metrics", self.listen, self.port)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+# 全局注册表和机器人使用的指标
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    "bot_stage_seconds",
+    "Time spent in each stage of handling a message",
+    ["stage", "chat_id"],
+)
+llm_seconds = registry.histogram(
+    "bot_llm_call_seconds",
+    "Duration of LLM calls, excluding time waiting for the rate limiter",
+    ["mode"],
+)
+llm_wait_seconds = registry.histogram(
+    "bot_llm_wait_seconds",
+    "Time LLM calls spent waiting for the rate limiter",
+)
+tool_seconds = registry.histogram(
+    "bot_tool_seconds",
+    "Duration of tool calls and individual indicators",
+    ["tool"],
+)
+http_retries = registry.counter(
+    "bot_http_retries_total",
+    "Upstream requests retried",
+    ["api"],
+)
+http_rate_limited = registry.counter(
+    "bot_http_rate_limited_total",
+    "Upstream responses with status 429",
+    ["api"],
+)
+cache_requests = registry.counter(
+    "bot_cache_requests_total",
+    "Cache lookups by result (hit, stale, miss, coalesced)",
+    ["cache", "result"],
+)
+dropped_replies = registry.counter(
+    "bot_dropped_replies_total",
+    "Replies that were not sent",
+    ["reason"],
+)